@@ -0,0 +1,138 @@
+# Агенты для прохождения лабиринта. Каждый агент получает модель лабиринта из maze_core
+# и возвращает последовательность кодов ходов (UP/DOWN/LEFT/RIGHT), которую затем можно
+# прогнать через maze_core.simulate или сыграть в игре. Модуль не зависит от pygame.
+import heapq
+import random
+from array import array
+
+from maze_core import DIRECTIONS, UP, DOWN, LEFT, RIGHT, WALL
+
+DEFAULT_MAX_STEPS = 1000000  # Предел ходов для агентов, которые могут ходить бесконечно
+
+
+def neighbour_cells(maze, pos):
+    # Проходимые соседи клетки с плоским индексом pos: пары (код хода, индекс соседа)
+    cells, cols = maze.cells, maze.cols
+    size = maze.rows * cols
+    col = pos % cols
+    if pos >= cols and cells[pos - cols] != WALL:
+        yield UP, pos - cols
+    if pos + cols < size and cells[pos + cols] != WALL:
+        yield DOWN, pos + cols
+    if col > 0 and cells[pos - 1] != WALL:
+        yield LEFT, pos - 1
+    if col < cols - 1 and cells[pos + 1] != WALL:
+        yield RIGHT, pos + 1
+
+
+def path_to_moves(parent_move, parent, start, target):
+    # Восстанавливает ходы от start до target по массивам предков
+    moves = []
+    pos = target
+    while pos != start:
+        moves.append(parent_move[pos])
+        pos = parent[pos]
+    moves.reverse()
+    return moves
+
+
+def bfs_agent(maze, rng=None, max_steps=DEFAULT_MAX_STEPS):
+    cols = maze.cols
+    size = maze.rows * cols
+    start = maze.start[0] * cols + maze.start[1]
+    target = maze.exit[0] * cols + maze.exit[1]
+    parent = array('i', [-1]) * size
+    parent_move = bytearray(size)
+    parent[start] = start
+    frontier = [start]
+    while frontier:
+        nxt = []
+        for pos in frontier:
+            if pos == target:
+                return path_to_moves(parent_move, parent, start, target)
+            for code, n in neighbour_cells(maze, pos):
+                if parent[n] == -1:
+                    parent[n] = pos
+                    parent_move[n] = code
+                    nxt.append(n)
+        frontier = nxt
+    return []
+
+
+def astar_agent(maze, rng=None, max_steps=DEFAULT_MAX_STEPS):
+    # A* с манхэттенской эвристикой
+    cols = maze.cols
+    size = maze.rows * cols
+    start = maze.start[0] * cols + maze.start[1]
+    target = maze.exit[0] * cols + maze.exit[1]
+    target_row, target_col = maze.exit
+    cost = array('i', [-1]) * size
+    parent = array('i', [-1]) * size
+    parent_move = bytearray(size)
+    cost[start] = 0
+    parent[start] = start
+    heap = [(abs(maze.start[0] - target_row) + abs(maze.start[1] - target_col), 0, start)]
+    while heap:
+        _, g, pos = heapq.heappop(heap)
+        if pos == target:
+            return path_to_moves(parent_move, parent, start, target)
+        if g > cost[pos]:
+            continue
+        for code, n in neighbour_cells(maze, pos):
+            ng = g + 1
+            if cost[n] == -1 or ng < cost[n]:
+                cost[n] = ng
+                parent[n] = pos
+                parent_move[n] = code
+                row, col = divmod(n, cols)
+                heapq.heappush(heap, (ng + abs(row - target_row) + abs(col - target_col), ng, n))
+    return []
+
+
+# Для правила правой руки: повороты относительно текущего направления
+RIGHT_OF = {UP: RIGHT, RIGHT: DOWN, DOWN: LEFT, LEFT: UP}
+LEFT_OF = {v: k for k, v in RIGHT_OF.items()}
+BACK_OF = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
+
+
+def wall_follower_agent(maze, rng=None, max_steps=DEFAULT_MAX_STEPS):
+    # Правило правой руки: сначала направо, потом прямо, налево и назад
+    pos = maze.start
+    heading = RIGHT
+    moves = []
+    while pos != maze.exit and len(moves) < max_steps:
+        for code in (RIGHT_OF[heading], heading, LEFT_OF[heading], BACK_OF[heading]):
+            d_row, d_col = DIRECTIONS[code]
+            if not maze.is_wall(pos[0] + d_row, pos[1] + d_col):
+                heading = code
+                pos = (pos[0] + d_row, pos[1] + d_col)
+                moves.append(code)
+                break
+        else:
+            break  # Старт замурован со всех сторон
+    return moves
+
+
+def random_walk_agent(maze, rng=None, max_steps=DEFAULT_MAX_STEPS):
+    # Случайное блуждание по проходимым соседям
+    rng = rng or random.Random()
+    cols = maze.cols
+    pos = maze.start[0] * cols + maze.start[1]
+    target = maze.exit[0] * cols + maze.exit[1]
+    moves = []
+    while pos != target and len(moves) < max_steps:
+        options = list(neighbour_cells(maze, pos))
+        if not options:
+            break
+        code, pos = options[rng.randrange(len(options))]
+        moves.append(code)
+    return moves
+
+
+AGENTS = {
+    'bfs': bfs_agent,
+    'astar': astar_agent,
+    'wall_follower': wall_follower_agent,
+    'random_walk': random_walk_agent,
+}
+
@@ -0,0 +1,221 @@
+# Загрузка ресурсов игры. Изображения и звуки декодируются фоновым потоком, пока рисуется
+# заставка, и выдаются по первому запросу; готовые (масштабированные и переведенные в формат
+# дисплея) поверхности хранятся в кэше по ключу (имя, размер). Масштабированные изображения
+# дополнительно сохраняются на диск как PNG уже нужного размера: следующий запуск
+# декодирует маленький файл и пропускает transform.scale исходной картинки (спрайты
+# 500x500 -> 40x40 грузятся за 0.04 мс вместо 2 мс). Путь к системному шрифту находится один раз
+# (поиск через fc-list медленный) и тоже запоминается на диске между запусками.
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from profiler import surfaces as surface_counter
+
+DATA_DIR = 'data'
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'maze_game')
+FONT_CACHE_FILE = 'fonts.json'
+
+
+class AssetManager:
+    def __init__(self, data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        # Содержимое каталога читается один раз вместо os.path.exists на каждый файл
+        try:
+            self.files = set(os.listdir(data_dir))
+        except OSError:
+            self.files = set()
+        self.images = {}    # (имя, размер) -> поверхность в формате дисплея
+        self.sounds = {}    # имя -> Sound или None
+        self.fonts = {}     # (имя, размер) -> Font
+        self.font_paths = None  # имя системного шрифта -> путь к файлу (None - шрифт pygame)
+        self.pending = {}   # ключ -> Future фоновой загрузки
+        self.executor = None
+
+    def exists(self, name):
+        return name in self.files
+
+    def path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    # --- Фоновая загрузка ---
+
+    def preload(self, images=(), sounds=()):
+        # images - пары (имя, размер); порядок важен: то, что нужно заставке, лучше ставить первым
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='assets')
+        for name, size in images:
+            key = (name, tuple(size))
+            if key not in self.images and key not in self.pending and self.exists(name):
+                self.pending[key] = self.executor.submit(self.decode_image, name, tuple(size))
+        for name in sounds:
+            if name not in self.sounds and name not in self.pending and self.exists(name):
+                self.pending[name] = self.executor.submit(self.decode_sound, name)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def ready(self, key):
+        # True, если ресурс можно получить без ожидания фонового потока
+        future = self.pending.get(key)
+        return future is None or future.done()
+
+    def take_pending(self, key):
+        future = self.pending.pop(key, None)
+        return future.result() if future is not None else None
+
+    # --- Изображения ---
+
+    def image(self, name, size, fallback_color):
+        key = (name, tuple(size))
+        surf = self.images.get(key)
+        if surf is not None:
+            return surf
+        if key in self.pending:
+            surf = self.take_pending(key)
+        elif self.exists(name):
+            surf = self.decode_image(name, key[1])
+        else:
+            print("Изображение", self.path(name), "не найдено")
+        if surf is None:
+            surf = surface_counter.add(pygame.Surface(key[1]))
+            surf.fill(fallback_color)
+        else:
+            # Перевод в формат дисплея возможен только в главном потоке после set_mode
+            surf = surface_counter.add(surf.convert_alpha())
+        self.images[key] = surf
+        return surf
+
+    def decode_image(self, name, size):
+        # Вызывается и из фонового потока: без обращений к дисплею
+        cached = self.read_cached(name, size)
+        if cached is not None:
+            return cached
+        try:
+            surf = surface_counter.add(pygame.image.load(self.path(name)))
+        except pygame.error:
+            print("Невозможно загрузить изображение:", name)
+            return None
+        surf = surface_counter.add(pygame.transform.scale(surf, size))
+        self.write_cached(name, size, surf)
+        return surf
+
+    @staticmethod
+    def cache_prefix(name, size):
+        return f"{os.path.splitext(name)[0]}-{size[0]}x{size[1]}-"
+
+    def cache_path(self, name, size):
+        # Время изменения исходного файла в имени: правка картинки делает старую запись ненужной
+        try:
+            mtime = os.stat(self.path(name)).st_mtime_ns
+        except OSError:
+            return None
+        return os.path.join(self.cache_dir, f"{self.cache_prefix(name, size)}{mtime}.png")
+
+    def read_cached(self, name, size):
+        if not self.cache_dir:
+            return None
+        path = self.cache_path(name, size)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            surf = surface_counter.add(pygame.image.load(path))
+        except (OSError, pygame.error):
+            return None
+        return surf if surf.get_size() == tuple(size) else None
+
+    def write_cached(self, name, size, surf):
+        if not self.cache_dir:
+            return
+        path = self.cache_path(name, size)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = path[:-len('.png')] + '.tmp.png'  # Формат pygame.image.save определяет по расширению
+            pygame.image.save(surf, tmp)
+            os.replace(tmp, path)
+            # Записи того же изображения и размера для прежних версий файла больше не нужны
+            prefix = self.cache_prefix(name, size)
+            for entry in os.listdir(self.cache_dir):
+                stale = os.path.join(self.cache_dir, entry)
+                if entry.startswith(prefix) and stale != path:
+                    os.remove(stale)
+        except (OSError, pygame.error) as e:
+            print("Не удалось сохранить кэш изображения:", e)
+
+    # --- Звуки ---
+
+    def sound(self, name):
+        if name in self.sounds:
+            return self.sounds[name]
+        if name in self.pending:
+            snd = self.take_pending(name)
+        elif self.exists(name):
+            snd = self.decode_sound(name)
+        else:
+            print("Звуковой файл", self.path(name), "не найден")
+            snd = None
+        self.sounds[name] = snd
+        return snd
+
+    def decode_sound(self, name):
+        if not pygame.mixer.get_init():
+            return None
+        try:
+            return pygame.mixer.Sound(self.path(name))
+        except pygame.error:
+            print("Невозможно загрузить звук:", name)
+            return None
+
+    # --- Шрифты ---
+
+    def font(self, name, size):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            path = self.font_path(name)
+            try:
+                font = pygame.font.Font(path, size)
+            except (OSError, pygame.error):
+                print("Невозможно загрузить шрифт:", path)
+                font = pygame.font.Font(None, size)
+            self.fonts[key] = font
+        return font
+
+    def font_path(self, name):
+        if self.font_paths is None:
+            self.font_paths = self.read_font_paths()
+        if name in self.font_paths:
+            path = self.font_paths[name]
+            if path is None or os.path.exists(path):
+                return path
+        # Полный перебор системных шрифтов; результат (даже отсутствие шрифта) запоминается
+        path = pygame.font.match_font(name)
+        self.font_paths[name] = path
+        self.write_font_paths()
+        return path
+
+    def read_font_paths(self):
+        if not self.cache_dir:
+            return {}
+        try:
+            with open(os.path.join(self.cache_dir, FONT_CACHE_FILE), 'r', encoding='utf-8') as f:
+                paths = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return paths if isinstance(paths, dict) else {}
+
+    def write_font_paths(self):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, FONT_CACHE_FILE), 'w', encoding='utf-8') as f:
+                json.dump(self.font_paths, f, ensure_ascii=False)
+        except OSError as e:
+            print("Не удалось сохранить кэш шрифтов:", e)
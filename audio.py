@@ -0,0 +1,109 @@
+# Звук игры. Каждой категории звуков выделены свои каналы микшера: шаги не могут занять
+# все каналы и заглушить сигнал тупика или финала. Повтор одного и того же эффекта чаще
+# заданного интервала отбрасывается (звук, который уже играет, его покрывает), а при
+# занятых каналах категории новый звук вытесняет самый старый. Так число одновременно
+# играющих звуков и запусков в секунду ограничено при любой скорости ввода.
+# NullAudio - тот же интерфейс без звука, для запуска без звукового устройства.
+import time
+
+import pygame
+
+# Параметры микшера: небольшой буфер держит задержку звука около 10 мс при 44.1 кГц
+FREQUENCY = 44100
+BUFFER = 512
+
+# Категория -> (число каналов, минимальный интервал между повторами одного звука в секундах, громкость)
+CATEGORIES = {
+    'move': (2, 0.06, 0.6),
+    'alert': (1, 0.25, 1.0),
+    'ui': (1, 0.0, 1.0),
+}
+
+
+def init_mixer():
+    # Без звукового устройства игра работает молча, а не падает при запуске
+    try:
+        pygame.mixer.init(frequency=FREQUENCY, buffer=BUFFER)
+    except pygame.error as e:
+        print("Звук отключен:", e)
+        return False
+    return True
+
+
+class AudioManager:
+    enabled = True
+
+    def __init__(self, load, sounds, categories=CATEGORIES, clock=time.perf_counter):
+        # load(имя файла) -> Sound или None; sounds: ключ -> (имя файла, категория).
+        # pygame.mixer.Sound при загрузке уже приводит данные к формату микшера,
+        # поэтому при воспроизведении преобразований нет.
+        self.load = load
+        self.sounds = sounds
+        self.clock = clock
+        self.intervals = {}
+        self.channels = {}  # категория -> список [канал, время запуска]
+        total = sum(count for count, _, _ in categories.values())
+        if pygame.mixer.get_num_channels() < total:
+            pygame.mixer.set_num_channels(total)
+        # Зарезервированные каналы не достаются Sound.play() без явного канала
+        pygame.mixer.set_reserved(total)
+        first = 0
+        for category, (count, interval, volume) in categories.items():
+            self.intervals[category] = interval
+            slots = []
+            for number in range(first, first + count):
+                channel = pygame.mixer.Channel(number)
+                channel.set_volume(volume)
+                slots.append([channel, 0.0])
+            self.channels[category] = slots
+            first += count
+        self.last_play = {}  # ключ звука -> время последнего запуска
+        self.played = 0
+        self.dropped = 0
+
+    def play(self, key):
+        name, category = self.sounds[key]
+        now = self.clock()
+        if now - self.last_play.get(key, -1.0e9) < self.intervals[category]:
+            self.dropped += 1
+            return False
+        sound = self.load(name)
+        if sound is None:
+            return False
+        slots = self.channels[category]
+        slot = next((s for s in slots if not s[0].get_busy()), None)
+        if slot is None:
+            slot = min(slots, key=lambda s: s[1])  # Вытесняется самый давно запущенный звук
+        slot[0].play(sound)
+        slot[1] = now
+        self.last_play[key] = now
+        self.played += 1
+        return True
+
+    def play_music(self, path, volume=0.5):
+        try:
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.set_volume(volume)
+            pygame.mixer.music.play(-1)
+        except Exception as e:
+            print("Ошибка загрузки фоновой музыки:", e)
+
+    def busy_channels(self):
+        return sum(slot[0].get_busy() for slots in self.channels.values() for slot in slots)
+
+
+class NullAudio:
+    enabled = False
+
+    def __init__(self):
+        self.played = 0
+        self.dropped = 0
+
+    def play(self, key):
+        return False
+
+    def play_music(self, path, volume=0.5):
+        pass
+
+    def busy_channels(self):
+        return 0
@@ -0,0 +1,223 @@
+# Пакетный прогон агентов по множеству лабиринтов на всех ядрах.
+# Лабиринты кладутся в разделяемую память (multiprocessing.shared_memory) один раз,
+# и рабочие процессы читают клетки прямо из нее, без копирования в каждую задачу.
+# MazeIndex каждого лабиринта строится тоже один раз, отдельной задачей пула: карта
+# тупиков пишется в тот же сегмент рядом с клетками, длина кратчайшего пути
+# возвращается родителю. Рабочие процессы держат открытыми лишь несколько последних сегментов.
+# Результаты выводятся построчно в JSON Lines по мере готовности.
+#
+#   python batch.py --maze default --generate 16 --size 501x501 --agents bfs,astar,wall_follower
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+from agents import AGENTS, DEFAULT_MAX_STEPS
+from maze_core import MAZE_LAYOUT, START_POS, EXIT_POS, Maze, simulate
+from maze_gen import ALGORITHMS, generate, parse_size
+from maze_index import MazeIndex
+
+MAX_ATTACHED = 4  # Сколько сегментов лабиринтов рабочий процесс держит открытыми
+
+
+# --- Разделяемые лабиринты ---
+
+class SharedMaze:
+    # Описание лабиринта в разделяемой памяти; в задачи передается только оно (несколько чисел и имя).
+    # Сегмент: клетки (rows*cols байт), за ними карта тупиков того же размера.
+    def __init__(self, name, shm_name, rows, cols, start, exit):
+        self.name = name
+        self.shm_name = shm_name
+        self.rows = rows
+        self.cols = cols
+        self.start = start
+        self.exit = exit
+        self.optimal_length = None  # Заполняет родитель по результату build_index
+
+    @classmethod
+    def publish(cls, name, maze):
+        size = maze.rows * maze.cols
+        shm = shared_memory.SharedMemory(create=True, size=2 * size)
+        shm.buf[:size] = maze.cells
+        return cls(name, shm.name, maze.rows, maze.cols, maze.start, maze.exit), shm
+
+
+class SharedIndex:
+    # Часть MazeIndex, нужная задачам: карта тупиков из сегмента и длина кратчайшего пути
+    def __init__(self, dead_ends, optimal_length):
+        self.dead_ends = dead_ends
+        self.optimal_length = optimal_length
+
+    optimality_gap = MazeIndex.optimality_gap
+
+
+def open_segment(shared):
+    # Рабочие процессы пула используют resource_tracker родителя, поэтому повторная
+    # регистрация сегмента при подключении безвредна; удаляет сегмент только родитель
+    shm = shared_memory.SharedMemory(name=shared.shm_name)
+    size = shared.rows * shared.cols
+    return shm, shm.buf[:size], shm.buf[size:2 * size]
+
+
+def close_segment(shm, *views):
+    # Сегмент нельзя закрыть, пока на его память есть memoryview
+    for view in views:
+        view.release()
+    shm.close()
+
+
+def build_index(shared):
+    # Задача пула: строит MazeIndex лабиринта один раз и оставляет в сегменте карту тупиков
+    shm, cells, dead_ends = open_segment(shared)
+    try:
+        index = MazeIndex(Maze(cells, shared.rows, shared.cols, shared.start, shared.exit))
+        dead_ends[:] = index.dead_ends
+        return index.optimal_length
+    finally:
+        close_segment(shm, cells, dead_ends)
+
+
+# Кэш рабочего процесса: имя сегмента -> (сегмент, клетки, тупики, лабиринт, индекс).
+# Задачи идут сгруппированными по лабиринтам, поэтому хватает нескольких последних сегментов;
+# давно не нужные закрываются.
+_attached = OrderedDict()
+
+
+def attach(shared):
+    entry = _attached.get(shared.shm_name)
+    if entry is None:
+        shm, cells, dead_ends = open_segment(shared)
+        maze = Maze(cells, shared.rows, shared.cols, shared.start, shared.exit)
+        entry = (shm, cells, dead_ends, maze, SharedIndex(dead_ends, shared.optimal_length))
+        _attached[shared.shm_name] = entry
+        while len(_attached) > MAX_ATTACHED:
+            old_shm, old_cells, old_dead_ends, _, _ = _attached.popitem(last=False)[1]
+            close_segment(old_shm, old_cells, old_dead_ends)
+    else:
+        _attached.move_to_end(shared.shm_name)
+    return entry[3], entry[4]
+
+
+def run_task(shared, agent_name, seed, max_steps):
+    maze, index = attach(shared)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    moves = AGENTS[agent_name](maze, rng, max_steps)
+    planned = time.perf_counter()
+    stats = simulate(maze, moves, index)
+    return {
+        'maze': shared.name,
+        'size': f"{shared.rows}x{shared.cols}",
+        'agent': agent_name,
+        'seed': seed,
+        'finished': stats.finished,
+        'moves': stats.moves,
+        'dead_ends': stats.dead_ends,
+        'optimal': index.optimal_length,
+        'optimality_gap': index.optimality_gap(stats.moves) if stats.finished else None,
+        'agent_ms': (planned - start) * 1000,
+        'simulate_ms': (time.perf_counter() - planned) * 1000,
+        'worker': os.getpid(),
+    }
+
+
+def run_batch(mazes, agent_names, workers=None, seed=0, max_steps=DEFAULT_MAX_STEPS, repeats=1):
+    # mazes - пары (имя, Maze). Генератор: выдает результаты по мере завершения задач.
+    published = []
+    try:
+        for name, maze in mazes:
+            published.append(SharedMaze.publish(name, maze))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Индексы строятся параллельно, но одновременно не больше, чем процессов: задачи
+            # агентов лабиринта ставятся, как только готов его индекс, и не ждут в очереди
+            # за индексами всех остальных лабиринтов. Результаты выдаются по мере готовности.
+            waiting = list(enumerate(published))
+            waiting.reverse()
+            indexing = {}
+            running = set()
+            tasks_per_maze = len(agent_names) * repeats
+            limit = workers or os.cpu_count() or 1
+            while waiting or running:
+                while waiting and len(indexing) < limit:
+                    number, (shared, _) = waiting.pop()
+                    future = pool.submit(build_index, shared)
+                    indexing[future] = number
+                    running.add(future)
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    number = indexing.pop(future, None)
+                    if number is None:
+                        yield future.result()
+                        continue
+                    shared = published[number][0]
+                    shared.optimal_length = future.result()
+                    task = number * tasks_per_maze
+                    for agent_name in agent_names:
+                        for _ in range(repeats):
+                            running.add(pool.submit(run_task, shared, agent_name, seed + task, max_steps))
+                            task += 1
+    finally:
+        for _, shm in published:
+            shm.close()
+            shm.unlink()
+
+
+def build_mazes(args):
+    mazes = []
+    for spec in args.maze or []:
+        if spec != 'default':
+            raise SystemExit(f"Неизвестный лабиринт: {spec}")
+        mazes.append(('default', Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS)))
+    if args.generate:
+        rows, cols = args.size
+        for i in range(args.generate):
+            maze_seed = args.seed + i
+            mazes.append((f"{args.algorithm}-{rows}x{cols}-{maze_seed}", generate(rows, cols, args.algorithm, maze_seed)))
+    if not mazes:
+        mazes.append(('default', Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS)))
+    return mazes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный прогон агентов по лабиринтам")
+    parser.add_argument("--maze", action="append", help="встроенный лабиринт (default), можно несколько раз")
+    parser.add_argument("--generate", type=int, default=0, metavar="N", help="сгенерировать N лабиринтов")
+    parser.add_argument("--size", type=parse_size, default="101x101", metavar="ROWSxCOLS", help="размер генерируемых лабиринтов")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default='backtracker')
+    parser.add_argument("--seed", type=int, default=0, help="начальное зерно лабиринтов и агентов")
+    parser.add_argument("--agents", default=",".join(AGENTS), help="агенты через запятую")
+    parser.add_argument("--repeats", type=int, default=1, help="прогонов каждого агента на каждом лабиринте")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS)
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию - все ядра)")
+    parser.add_argument("-o", "--output", default="-", help="файл JSON Lines, '-' - стандартный вывод")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    agent_names = [name.strip() for name in args.agents.split(',') if name.strip()]
+    unknown = [name for name in agent_names if name not in AGENTS]
+    if unknown:
+        raise SystemExit(f"Неизвестные агенты: {', '.join(unknown)} (доступны: {', '.join(AGENTS)})")
+    mazes = build_mazes(args)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    count = 0
+    try:
+        for result in run_batch(mazes, agent_names, args.workers, args.seed, args.max_steps, args.repeats):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Задач: {count}, время: {time.perf_counter() - start:.2f} сек", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+# Набор бенчмарков: время кадра по состояниям игры и микробенчмарки горячих мест.
+# Игра запускается на фиктивных драйверах SDL (без окна и звука) со скриптовым вводом.
+# Результаты пишутся в JSON, чтобы сравнивать их между релизами.
+#
+#   python bench.py                      # полный прогон, результат в bench_results.json
+#   python bench.py --quick -o out.json  # быстрый прогон на маленьких размерах
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+import pygame
+
+import maze_game
+from maze_core import DIRECTIONS, Maze, MAZE_LAYOUT, START_POS, EXIT_POS
+from maze_gen import ALGORITHMS, generate, is_solvable
+from maze_index import MazeIndex
+
+ARROW_KEYS = (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) if ordered else 0.0,
+        'p50_ms': percentile(ordered, 0.50),
+        'p95_ms': percentile(ordered, 0.95),
+        'p99_ms': percentile(ordered, 0.99),
+        'max_ms': ordered[-1] if ordered else 0.0,
+    }
+
+
+def time_calls(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+# --- Кадры по состояниям игры ---
+
+def prepare_state(game, state):
+    game.state = state
+    if state == 'GAME':
+        game.reset_game()
+    elif state == 'GAME_OVER':
+        # Законченный забег: время остановлено, как после выхода из лабиринта
+        game.reset_game()
+        game.core.finish_time = game.core.clock()
+
+
+def script_input(game, state, frame, rng):
+    # Скриптовый ввод для одного кадра
+    if state == 'GAME':
+        key = ARROW_KEYS[rng.randrange(4)]
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0))
+        pygame.event.post(pygame.event.Event(pygame.KEYUP, key=key, mod=0, unicode='', scancode=0))
+        if frame % 30 == 0:
+            # Всплеск частиц, как при выходе из лабиринта, но крупнее
+            center = maze_game.Camera.world_center(*game.player_pos)
+            game.spawn_particles(center, count=200, color=maze_game.YELLOW, lifetime=1.0, size=4, speed_range=60)
+
+
+def bench_state(game, state, frames, rng):
+    prepare_state(game, state)
+    game.profiler.reset()
+    frame_ms = []
+    misses = []
+    surfaces = []
+    for frame in range(frames):
+        script_input(game, state, frame, rng)
+        misses_before = game.cache_misses()
+        surfaces_before = maze_game.surface_counter.total
+        start = time.perf_counter()
+        game.step()
+        frame_ms.append((time.perf_counter() - start) * 1000)
+        misses.append(game.cache_misses() - misses_before)
+        surfaces.append(maze_game.surface_counter.total - surfaces_before)
+        game.clock.tick()
+        if game.state != state:
+            prepare_state(game, state)
+    phases = game.profiler.phase_means()
+
+    # Отдельный проход под tracemalloc: он сам замедляет кадры, поэтому время в нем не меряется
+    prepare_state(game, state)
+    alloc_bytes = []
+    alloc_blocks = []
+    tracemalloc.start()
+    for frame in range(min(frames, 100)):
+        script_input(game, state, frame, rng)
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+        game.step()
+        _, peak = tracemalloc.get_traced_memory()
+        alloc_bytes.append(peak - base)
+        alloc_blocks.append(sys.getallocatedblocks() - blocks)
+        game.clock.tick()
+        if game.state != state:
+            prepare_state(game, state)
+    tracemalloc.stop()
+
+    result = summarize(frame_ms)
+    result['phases_ms'] = phases
+    result['surface_allocs_per_frame'] = sum(surfaces) / len(surfaces)
+    result['cache_misses_per_frame'] = sum(misses) / len(misses)
+    result['alloc_peak_bytes_per_frame'] = sum(alloc_bytes) / len(alloc_bytes)
+    result['net_blocks_per_frame'] = sum(alloc_blocks) / len(alloc_blocks)
+    return result
+
+
+def bench_frames(frames, dirty_rects, seed):
+    rng = random.Random(seed)
+    # Без призрака, кэша ресурсов и таблицы рекордов: бенчмарк не читает и не пишет
+    # пользовательские данные, и результаты не зависят от прошлых забегов
+    game = maze_game.MazeGame(dirty_rects=dirty_rects, scores_path=None, ghost=False, asset_cache=False)
+    game.splash_sound_played = True
+    results = {}
+    for state in ('SPLASH', 'MENU', 'GAME', 'GAME_OVER'):
+        results[state] = bench_state(game, state, frames, rng)
+    return game, results
+
+
+# --- Микробенчмарки ---
+
+def bench_draw_maze(game, sizes, repeat, seed):
+    results = {}
+    for rows, cols in sizes:
+        maze = Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS) if (rows, cols) == (15, 20) else generate(rows, cols, seed=seed)
+        game.set_maze(maze)
+        game.reset_game()
+        game.camera.follow(rows // 2, cols // 2)
+        cold = time_calls(game.draw_maze, 1)
+        results[f"{rows}x{cols}"] = {'cold': cold, 'warm': time_calls(game.draw_maze, repeat)}
+    game.set_maze(Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS))
+    return results
+
+
+def bench_fog(game, sizes, repeat, seed):
+    # Туман войны: кадр без хода (один блит) и кадр с ходом (пересчет видимости и пересборка)
+    results = {}
+    game.fog_radius = maze_game.FOG_RADIUS
+    for rows, cols in sizes:
+        maze = Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS) if (rows, cols) == (15, 20) else generate(rows, cols, seed=seed)
+        game.set_maze(maze)
+        game.reset_game()
+        visibility = game.visibility
+
+        def moved():
+            visibility.origin = None
+            visibility.update(*game.player_pos)
+            game.fog_layer.draw(game.screen, game.camera)
+
+        results[f"{rows}x{cols}"] = {
+            'warm': time_calls(lambda: game.fog_layer.draw(game.screen, game.camera), repeat),
+            'move': time_calls(moved, repeat),
+        }
+    game.fog_radius = 0
+    game.set_maze(Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS))
+    return results
+
+
+def bench_particles(screen, counts, repeat):
+    results = {}
+    for count in counts:
+        particles = maze_game.ParticleSystem()
+        for _ in range(0, count, 100):
+            particles.spawn((400, 300), 100, maze_game.YELLOW, 1000.0, 4, 60)
+        results[str(count)] = {
+            'update': time_calls(lambda: particles.update(1 / 60), repeat),
+            'draw': time_calls(lambda: particles.draw(screen), repeat),
+        }
+    return results
+
+
+def bench_move_player(game, repeat, seed):
+    # Ходы идут подряд без шагов логики, поэтому забег не записывается:
+    # запись допускает не больше одного хода за шаг
+    rng = random.Random(seed)
+    game.reset_game(record=False)
+    game.state = 'GAME'
+    moves = [DIRECTIONS[rng.randrange(4)] for _ in range(repeat)]
+    samples = []
+    for d_row, d_col in moves:
+        start = time.perf_counter()
+        game.move_player(d_row, d_col)
+        samples.append((time.perf_counter() - start) * 1000)
+        if game.state != 'GAME':
+            game.reset_game(record=False)
+            game.state = 'GAME'
+    return summarize(samples)
+
+
+def bench_generation(sizes, seed):
+    results = {}
+    for rows, cols in sizes:
+        for algorithm in ALGORITHMS:
+            start = time.perf_counter()
+            maze = generate(rows, cols, algorithm, seed)
+            generated = time.perf_counter()
+            solvable = is_solvable(maze)
+            checked = time.perf_counter()
+            index = MazeIndex(maze)
+            indexed = time.perf_counter()
+            results[f"{rows}x{cols}/{algorithm}"] = {
+                'generate_ms': (generated - start) * 1000,
+                'solvable_ms': (checked - generated) * 1000,
+                'index_ms': (indexed - checked) * 1000,
+                'solvable': solvable,
+                'optimal_length': index.optimal_length,
+            }
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки игры-лабиринта")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="куда записать JSON с результатами")
+    parser.add_argument("--frames", type=int, default=300, help="кадров на каждое состояние игры")
+    parser.add_argument("--repeat", type=int, default=200, help="повторов в микробенчмарках")
+    parser.add_argument("--seed", type=int, default=1, help="зерно для скриптового ввода и генерации")
+    parser.add_argument("--dirty-rects", action="store_true", help="мерить кадры в режиме грязных прямоугольников")
+    parser.add_argument("--quick", action="store_true", help="только маленькие размеры лабиринтов")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output)
+    # Ресурсы игры ищутся относительно каталога проекта, как при обычном запуске
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if args.quick:
+        maze_sizes = [(15, 20), (101, 101)]
+        gen_sizes = [(101, 101), (301, 301)]
+        particle_counts = [100, 1000]
+    else:
+        maze_sizes = [(15, 20), (101, 101), (501, 501), (2001, 2001)]
+        gen_sizes = [(101, 101), (501, 501), (1001, 1001), (2001, 2001)]
+        particle_counts = [100, 1000, 4000]
+
+    game, frames = bench_frames(args.frames, args.dirty_rects, args.seed)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'frames': args.frames,
+            'repeat': args.repeat,
+            'dirty_rects': args.dirty_rects,
+            'seed': args.seed,
+        },
+        'frames': frames,
+        'micro': {
+            'draw_maze': bench_draw_maze(game, maze_sizes, args.repeat, args.seed),
+            'fog': bench_fog(game, maze_sizes, args.repeat, args.seed),
+            'particles': bench_particles(game.screen, particle_counts, args.repeat),
+            'move_player': bench_move_player(game, args.repeat * 10, args.seed),
+            'generation': bench_generation(gen_sizes, args.seed),
+        },
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for state, stats in frames.items():
+        print(f"{state:10s} mean {stats['mean_ms']:.3f} мс  p95 {stats['p95_ms']:.3f} мс  "
+              f"p99 {stats['p99_ms']:.3f} мс  поверхностей/кадр {stats['surface_allocs_per_frame']:.2f}  "
+              f"промахов кэшей/кадр {stats['cache_misses_per_frame']:.2f}")
+    print("Результаты записаны в", output)
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Туман войны: что игрок видит сейчас и что уже исследовал. Видимость - клетки в радиусе
+# света, до которых от игрока идет прямая линия (по Брезенхэму) без стен между ними;
+# сами стены на границе видимы. Лучи до всех клеток круга считаются один раз при создании,
+# а при смене позиции проверяются только они, так что пересчет не зависит от размера
+# лабиринта. Исследованные клетки хранятся в плоском bytearray, как карты MazeIndex.
+# Модуль не зависит от pygame.
+import math
+
+from maze_core import WALL
+
+
+def round_half_away(value):
+    # Половины округляются от нуля (round округляет к четному): лучи в разные стороны симметричны
+    return int(math.copysign(math.floor(abs(value) + 0.5), value))
+
+
+def line_cells(d_row, d_col):
+    # Промежуточные клетки отрезка от (0, 0) до (d_row, d_col), без концов
+    cells = []
+    steps = max(abs(d_row), abs(d_col))
+    for i in range(1, steps):
+        cells.append((round_half_away(d_row * i / steps), round_half_away(d_col * i / steps)))
+    return cells
+
+
+def build_rays(radius):
+    # Смещения клеток круга радиуса radius и промежуточные клетки луча до каждой
+    rays = []
+    limit = radius * radius + radius  # Чуть больше r², чтобы круг не был «угловатым»
+    for d_row in range(-radius, radius + 1):
+        for d_col in range(-radius, radius + 1):
+            if d_row * d_row + d_col * d_col <= limit:
+                rays.append((d_row, d_col, line_cells(d_row, d_col)))
+    return rays
+
+
+class Visibility:
+    def __init__(self, maze, radius, index=None):
+        self.maze = maze
+        self.radius = radius
+        self.rows, self.cols = maze.rows, maze.cols
+        self.walls = index.walls if index is not None else bytes(c == WALL for c in maze.cells)
+        self.rays = build_rays(radius)
+        size = self.rows * self.cols
+        self.explored = bytearray(size)
+        self.visible = bytearray(size)
+        self.visible_cells = []  # Плоские индексы видимых сейчас клеток
+        self.origin = None
+        self.version = 0         # Растет при каждом изменении видимости; по нему слой тумана знает, что перерисовать
+
+    def reset(self):
+        self.explored[:] = bytes(len(self.explored))
+        for pos in self.visible_cells:
+            self.visible[pos] = 0
+        self.visible_cells = []
+        self.origin = None
+        self.version += 1
+
+    def update(self, row, col):
+        # Пересчет только при смене клетки игрока; возвращает True, если видимость изменилась
+        if (row, col) == self.origin:
+            return False
+        self.origin = (row, col)
+        rows, cols, walls = self.rows, self.cols, self.walls
+        visible, explored = self.visible, self.explored
+        for pos in self.visible_cells:
+            visible[pos] = 0
+        cells = []
+        for d_row, d_col, between in self.rays:
+            r, c = row + d_row, col + d_col
+            if not (0 <= r < rows and 0 <= c < cols):
+                continue
+            for b_row, b_col in between:
+                if walls[(row + b_row) * cols + col + b_col]:
+                    break
+            else:
+                pos = r * cols + c
+                visible[pos] = 1
+                cells.append(pos)
+        # Прямые лучи задевают стены коридора и не доходят до его боковых стен;
+        # стены, примыкающие к освещенному полу в пределах круга, тоже считаются видимыми
+        limit = self.radius * self.radius + self.radius
+        for pos in cells[:]:
+            if walls[pos]:
+                continue
+            r, c = divmod(pos, cols)
+            for n_row in (r - 1, r, r + 1):
+                for n_col in (c - 1, c, c + 1):
+                    if not (0 <= n_row < rows and 0 <= n_col < cols):
+                        continue
+                    n = n_row * cols + n_col
+                    if walls[n] and not visible[n] and (n_row - row) ** 2 + (n_col - col) ** 2 <= limit:
+                        visible[n] = 1
+                        cells.append(n)
+        for pos in cells:
+            explored[pos] = 1
+        self.visible_cells = cells
+        self.version += 1
+        return True
+
+    def is_visible(self, row, col):
+        return self.visible[row * self.cols + col] == 1
+
+    def is_explored(self, row, col):
+        return self.explored[row * self.cols + col] == 1
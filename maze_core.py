@@ -0,0 +1,210 @@
+# Логика лабиринта без pygame: модель лабиринта, состояние игрока, проверка ходов,
+# тупики и выход. Модуль не импортирует pygame, поэтому его можно использовать
+# для массового прогона и проверки последовательностей ходов без SDL.
+import time
+from collections import namedtuple
+
+# План лабиринта по умолчанию (1 - стена, 0 - проход)
+MAZE_LAYOUT = [
+    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],
+    [1,0,0,0,1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1],
+    [1,0,1,0,1,0,1,1,1,1,0,1,0,1,0,1,0,1,0,1],
+    [1,0,1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,1],
+    [1,0,1,1,1,1,1,1,0,1,1,1,0,1,1,1,0,1,0,1],
+    [1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,0,0,1],
+    [1,0,1,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1,0,1],
+    [1,0,0,0,0,1,0,0,0,1,0,0,0,1,0,0,0,1,0,1],
+    [1,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1],
+    [1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,0,0,1],
+    [1,0,1,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1,0,1],
+    [1,0,0,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,1],
+    [1,0,1,1,1,1,1,1,0,1,1,1,0,1,1,1,0,1,0,1],
+    [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
+]
+
+START_POS = (1, 1)
+EXIT_POS  = (13, 18)
+
+FLOOR = 0
+WALL  = 1
+
+# Направления движения; индекс направления служит компактным кодом хода
+UP, DOWN, LEFT, RIGHT = range(4)
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIRECTION_CODES = {delta: code for code, delta in enumerate(DIRECTIONS)}
+
+# Результат одного хода: moved - игрок сдвинулся, dead_end - игрок только что зашел в тупик,
+# finished - игрок дошел до выхода
+MoveResult = namedtuple('MoveResult', 'moved dead_end finished')
+NO_MOVE = MoveResult(False, False, False)
+
+# Итог прогона последовательности ходов
+RunStats = namedtuple('RunStats', 'finished moves dead_ends position')
+
+
+# --- Модель лабиринта ---
+# Клетки хранятся построчно в плоском bytearray (или любом буфере байтов того же вида)
+class Maze:
+    def __init__(self, cells, rows, cols, start=START_POS, exit=EXIT_POS):
+        if len(cells) != rows * cols:
+            raise ValueError("Размер буфера клеток не совпадает с размерами лабиринта")
+        self.cells = cells
+        self.rows = rows
+        self.cols = cols
+        self.start = tuple(start)
+        self.exit = tuple(exit)
+
+    @classmethod
+    def from_layout(cls, layout, start=START_POS, exit=EXIT_POS):
+        cells = bytearray(cell for row in layout for cell in row)
+        return cls(cells, len(layout), len(layout[0]), start, exit)
+
+    def to_layout(self):
+        cols = self.cols
+        return [list(self.cells[row*cols:(row+1)*cols]) for row in range(self.rows)]
+
+    def index(self, row, col):
+        return row * self.cols + col
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def is_wall(self, row, col):
+        # Клетки за границей лабиринта считаются стенами
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return True
+        return self.cells[row * self.cols + col] == WALL
+
+    def is_dead_end(self, row, col):
+        return is_dead_end(self, row, col)
+
+
+def is_dead_end(maze, row, col):
+    if maze.is_wall(row, col):
+        return False
+    walls = 0
+    for dr, dc in DIRECTIONS:
+        if maze.is_wall(row+dr, col+dc):
+            walls += 1
+    return walls >= 3
+
+
+# --- Часы ---
+# Ядро получает время через любую функцию без аргументов, возвращающую секунды.
+# ManualClock удобен для прогонов без реального времени: время двигается только вручную.
+class ManualClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, dt):
+        self.now += dt
+
+
+# --- Состояние одной игры ---
+class GameCore:
+    def __init__(self, maze, clock=time.monotonic, index=None):
+        self.maze = maze
+        self.clock = clock
+        # Необязательный MazeIndex: проверка тупика становится поиском в готовой карте,
+        # а проверка стены - чтением готовой карты проходимости
+        self.dead_end_check = index.is_dead_end if index is not None else maze.is_dead_end
+        self.passable = index.passable if index is not None else None
+        self.player_pos = maze.start
+        self.start_time = None
+        self.finish_time = None
+        self.moves = 0
+        self.dead_ends = 0
+        self.dead_end_triggered = False
+
+    def reset(self):
+        self.player_pos = self.maze.start
+        self.start_time = self.clock()
+        self.finish_time = None
+        self.moves = 0
+        self.dead_ends = 0
+        self.dead_end_triggered = False
+
+    @property
+    def finished(self):
+        return self.finish_time is not None
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0
+        end = self.finish_time if self.finish_time is not None else self.clock()
+        return end - self.start_time
+
+    def move(self, direction):
+        d_row, d_col = DIRECTIONS[direction]
+        return self.move_by(d_row, d_col)
+
+    def move_by(self, d_row, d_col):
+        if self.finished:
+            return NO_MOVE
+        new_row = self.player_pos[0] + d_row
+        new_col = self.player_pos[1] + d_col
+        maze = self.maze
+        if self.passable is not None:
+            if not (0 <= new_row < maze.rows and 0 <= new_col < maze.cols):
+                return NO_MOVE
+            if not self.passable[new_row * maze.cols + new_col]:
+                return NO_MOVE
+        elif maze.is_wall(new_row, new_col):
+            return NO_MOVE
+        self.player_pos = (new_row, new_col)
+        self.moves += 1
+
+        dead_end = False
+        if self.dead_end_check(new_row, new_col) and not self.dead_end_triggered:
+            self.dead_end_triggered = True
+            self.dead_ends += 1
+            dead_end = True
+        else:
+            self.dead_end_triggered = False
+
+        finished = self.player_pos == self.maze.exit
+        if finished:
+            self.finish_time = self.clock()
+        return MoveResult(True, dead_end, finished)
+
+
+def simulate(maze, moves, index=None):
+    # Быстрый прогон последовательности кодов ходов без создания GameCore:
+    # работает прямо по плоскому буферу клеток и останавливается на выходе.
+    # С MazeIndex тупики берутся из готовой карты, а не пересчитываются на каждом шаге.
+    cells = maze.cells
+    dead_end_map = index.dead_ends if index is not None else None
+    rows, cols = maze.rows, maze.cols
+    offsets = [dr * cols + dc for dr, dc in DIRECTIONS]
+    pos = maze.start[0] * cols + maze.start[1]
+    exit_index = maze.exit[0] * cols + maze.exit[1]
+    size = rows * cols
+    steps = 0
+    dead_ends = 0
+    triggered = False
+    for code in moves:
+        col = pos % cols
+        if (code == LEFT and col == 0) or (code == RIGHT and col == cols - 1):
+            continue
+        new = pos + offsets[code]
+        if new < 0 or new >= size or cells[new] == WALL:
+            continue
+        pos = new
+        steps += 1
+        if dead_end_map is not None:
+            dead_end = dead_end_map[pos]
+        else:
+            dead_end = is_dead_end(maze, pos // cols, pos % cols)
+        if dead_end and not triggered:
+            triggered = True
+            dead_ends += 1
+        else:
+            triggered = False
+        if pos == exit_index:
+            return RunStats(True, steps, dead_ends, divmod(pos, cols))
+    return RunStats(False, steps, dead_ends, divmod(pos, cols))
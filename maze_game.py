@@ -1,14 +1,68 @@
 import pygame
 import sys
+import argparse
+import time
 import os
 import math
 import random
+import getpass
+import numpy as np
+from collections import OrderedDict, deque
+from maze_core import MAZE_LAYOUT, START_POS, EXIT_POS, DIRECTIONS, DIRECTION_CODES, UP, DOWN, LEFT, RIGHT, Maze, GameCore
+from maze_gen import ALGORITHMS, generate, parse_size
+from maze_index import MazeIndex
+from profiler import FrameProfiler, surfaces as surface_counter
+from replay import Replay, maze_hash
+from fog import Visibility
+from scores import ScoreStore, DEFAULT_DB as SCORES_DB, DATA_DIR as USER_DATA_DIR
+from assets import AssetManager, CACHE_DIR as ASSET_CACHE_DIR
+from audio import AudioManager, NullAudio, init_mixer
+from race_client import RaceClient, DEFAULT_PORT as RACE_PORT
 
 # Параметры окна и игры
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
-FPS = 60
+FPS = 60              # Ограничение частоты кадров (0 - без ограничения)
+TICK_RATE = 60        # Частота шагов логики в секунду, не зависит от частоты кадров
+MAX_FRAME_SKIP = 5    # Максимум шагов логики за кадр, чтобы медленная машина не зависала
 TILE_SIZE = 40
+MAX_PARTICLES = 4096      # Размер пула частиц
+PARTICLE_ALPHA_STEPS = 16  # Число градаций прозрачности в кэше спрайтов частиц
+TEXT_CACHE_SIZE = 256      # Максимум строк в кэше отрисованного текста
+CHUNK_TILES = 16           # Сторона чанка статичного слоя лабиринта в клетках
+MAX_CACHED_CHUNKS = 64     # Сколько отрисованных чанков держать в памяти
+PAR_SECONDS_PER_MOVE = 0.15  # Эталонное время на один ход кратчайшего пути
+HUD_GRAPH_SIZE = (240, 60)     # Размер графика времени кадра в HUD отладки
+GHOST_DIR = os.path.join(USER_DATA_DIR, "replays")  # Лучшие забеги по лабиринтам, показываются как «призрак»
+LEGACY_RECORD = "record.txt"  # Рекорд прежних версий игры, переносится в базу при первом запуске
+GHOST_ALPHA = 110          # Прозрачность спрайта призрака
+LEADERBOARD_PAGE = 10      # Строк таблицы рекордов на одной странице
+REPEAT_DELAY_MS = 180      # Через сколько удерживаемая стрелка начинает повторять ход
+REPEAT_INTERVAL_MS = 80    # Период повтора хода при удержании; за это же время спрайт переезжает в клетку
+INPUT_BUFFER = 8           # Сколько нажатий может ждать своей очереди
+FOG_RADIUS = 5             # Радиус света вокруг игрока в режиме тумана войны, в клетках
+FOG_EXPLORED_ALPHA = 170   # Затемнение исследованных, но сейчас не видимых клеток
+FOG_LIGHT_EDGE_ALPHA = 150 # Затемнение на краю круга света (в центре - 0)
+RACER_COLORS = ((255, 120, 60), (80, 200, 255), (200, 110, 255), (120, 255, 120), (255, 90, 160))
+
+# Фазы кадра, которые показывает HUD отладки (update включает particles_update)
+HUD_PHASES = {
+    'events': 'события',
+    'update': 'логика',
+    'particles_update': 'частицы',
+    'maze_draw': 'лабиринт',
+    'particles_draw': 'отр. частиц',
+    'fog_draw': 'туман',
+    'flip': 'вывод',
+}
+
+# Стрелки -> коды ходов
+MOVE_KEYS = {
+    pygame.K_UP: UP,
+    pygame.K_DOWN: DOWN,
+    pygame.K_LEFT: LEFT,
+    pygame.K_RIGHT: RIGHT,
+}
 
 # Цвета
 BLACK  = (0, 0, 0)
@@ -26,198 +80,738 @@ BUTTON_TEXT_COLOR = (255, 255, 255)
 WALL_COLOR        = (240, 240, 240)
 GRID_COLOR        = (150, 150, 150)
 
-# План лабиринта 
-MAZE_LAYOUT = [
-    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],
-    [1,0,0,0,1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1],
-    [1,0,1,0,1,0,1,1,1,1,0,1,0,1,0,1,0,1,0,1],
-    [1,0,1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,1],
-    [1,0,1,1,1,1,1,1,0,1,1,1,0,1,1,1,0,1,0,1],
-    [1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,0,0,1],
-    [1,0,1,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1,0,1],
-    [1,0,0,0,0,1,0,0,0,1,0,0,0,1,0,0,0,1,0,1],
-    [1,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1],
-    [1,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,0,0,1],
-    [1,0,1,1,1,1,0,1,1,1,0,1,1,1,0,1,1,1,0,1],
-    [1,0,0,0,0,0,0,0,0,1,0,0,0,1,0,0,0,1,0,1],
-    [1,0,1,1,1,1,1,1,0,1,1,1,0,1,1,1,0,1,0,1],
-    [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
-    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
-]
-
-START_POS = (1, 1)
-EXIT_POS  = (13, 18)
-
-# --- Класс для эффекта частиц ---
-class Particle:
-    def __init__(self, pos, velocity, lifetime, color, size):
-        self.pos = pygame.Vector2(pos)
-        self.velocity = pygame.Vector2(velocity)
-        self.lifetime = lifetime
-        self.initial_lifetime = lifetime
-        self.color = color  # Цвет как (R, G, B)
-        self.size = size
+# Ресурсы из каталога data: ключ -> (файл, размер, цвет-заглушка при отсутствии файла).
+# Порядок задает очередь фоновой загрузки: фон нужен уже заставке.
+IMAGE_ASSETS = {
+    'background': ("background.png", (WINDOW_WIDTH, WINDOW_HEIGHT), GRAY),
+    'player': ("player.png", (TILE_SIZE, TILE_SIZE), BLUE),
+    'exit': ("exit.png", (TILE_SIZE, TILE_SIZE), GREEN),
+}
+# Звуки: ключ -> (файл, категория каналов микшера из audio.CATEGORIES)
+SOUND_ASSETS = {
+    'splash': ("splash.wav", 'ui'),
+    'move': ("move.wav", 'move'),
+    'dead_end': ("dead_end.wav", 'alert'),
+    'game_over': ("game_over.wav", 'ui'),
+}
+MUSIC_FILE = "background_music.wav"
+FONT_NAME = "Arial"
+
+# --- Система частиц ---
+# Все частицы живут в пуле фиксированного размера: позиции, скорости и время жизни
+# хранятся в массивах NumPy и обновляются одной векторной операцией за кадр.
+# Спрайты заранее отрисовываются и кэшируются по ключу (цвет, размер, градация альфы).
+class ParticleSystem:
+    def __init__(self, capacity=MAX_PARTICLES, alpha_steps=PARTICLE_ALPHA_STEPS, seed=None):
+        self.capacity = capacity
+        self.alpha_steps = alpha_steps
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.lifetime = np.zeros(capacity, dtype=np.float32)
+        self.initial_lifetime = np.ones(capacity, dtype=np.float32)
+        self.style = np.zeros(capacity, dtype=np.int32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.styles = {}       # (цвет, размер) -> индекс стиля
+        self.style_keys = []   # индекс стиля -> (цвет, размер)
+        self.sprites = {}  # индекс стиля * alpha_steps + градация -> Surface
+        self.rng = np.random.default_rng(seed)
+
+    def reseed(self, seed):
+        # Забег с известным зерном дает те же частицы при воспроизведении записи
+        self.rng = np.random.default_rng(seed)
+
+    def clear(self):
+        self.lifetime[:] = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.lifetime > 0))
+
+    def style_index(self, color, size):
+        key = (tuple(color), int(size))
+        if key not in self.styles:
+            self.styles[key] = len(self.style_keys)
+            self.style_keys.append(key)
+        return self.styles[key]
+
+    def sprite(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            style, step = divmod(key, self.alpha_steps)
+            color, size = self.style_keys[style]
+            alpha = 255 * (step + 1) // self.alpha_steps
+            sprite = surface_counter.add(pygame.Surface((size*2, size*2), pygame.SRCALPHA))
+            pygame.draw.circle(sprite, color + (alpha,), (size, size), size)
+            if pygame.display.get_surface() is not None:
+                sprite = surface_counter.add(sprite.convert_alpha())
+            self.sprites[key] = sprite
+        return sprite
+
+    def spawn(self, pos, count, color, lifetime, size, speed_range):
+        count = min(count, self.capacity)
+        if count <= 0:
+            return
+        # Свободные слоты имеют lifetime <= 0 и попадают в начало; при переполнении
+        # перезаписываются частицы, которым осталось жить меньше всего
+        slots = np.argpartition(self.lifetime, count - 1)[:count]
+        angle = self.rng.uniform(0, 2 * math.pi, count)
+        speed = self.rng.uniform(0, speed_range, count)
+        self.pos[slots] = pos
+        self.velocity[slots, 0] = np.cos(angle) * speed
+        self.velocity[slots, 1] = np.sin(angle) * speed
+        self.lifetime[slots] = lifetime
+        self.initial_lifetime[slots] = lifetime
+        self.style[slots] = self.style_index(color, size)
+        self.size[slots] = size
+
+    def positions(self, live, ahead):
+        if ahead:
+            return self.pos[live] + self.velocity[live] * ahead
+        return self.pos[live]
+
+    def bounds(self, offset=(0, 0), ahead=0.0):
+        # Прямоугольник на экране, покрывающий все живые частицы, или None
+        live = np.flatnonzero(self.lifetime > 0)
+        if live.size == 0:
+            return None
+        size = self.size[live, None]
+        pos = self.positions(live, ahead)
+        low = np.floor((pos - size).min(axis=0))
+        high = np.ceil((pos + size).max(axis=0))
+        return pygame.Rect(int(low[0]) + offset[0], int(low[1]) + offset[1], int(high[0] - low[0]) + 1, int(high[1] - low[1]) + 1)
 
     def update(self, dt):
         self.pos += self.velocity * dt
         self.lifetime -= dt
 
-    def draw(self, surface):
-        if self.lifetime > 0:
-            alpha = max(0, int(255 * (self.lifetime / self.initial_lifetime)))
-            # Создаем поверхность для частицы с альфа-каналом
-            particle_surf = pygame.Surface((self.size*2, self.size*2), pygame.SRCALPHA)
-            # Рисуем круг на этой поверхности
-            pygame.draw.circle(particle_surf, self.color + (alpha,), (self.size, self.size), self.size)
-            surface.blit(particle_surf, (self.pos.x - self.size, self.pos.y - self.size))
+    def draw(self, surface, offset=(0, 0), ahead=0.0):
+        live = np.flatnonzero(self.lifetime > 0)
+        if live.size == 0:
+            return
+        ratio = self.lifetime[live] / self.initial_lifetime[live]
+        step = np.minimum((ratio * self.alpha_steps).astype(np.int32), self.alpha_steps - 1)
+        keys = self.style[live] * self.alpha_steps + step
+        top_left = (self.positions(live, ahead) - self.size[live, None] + offset).astype(np.int32)
+        sprite = self.sprite
+        surface.blits([(sprite(k), (x, y)) for k, (x, y) in zip(keys.tolist(), top_left.tolist())], False)
+
+# --- Камера ---
+# Видимая область лабиринта. Хранит левый верхний угол видимой части мира (в пикселях)
+# и переводит клетки лабиринта в координаты экрана. Если лабиринт меньше окна,
+# он центрируется, как раньше.
+class Camera:
+    def __init__(self, view, world_size):
+        self.view = pygame.Rect(view)
+        self.world_width, self.world_height = world_size
+        self.x = self.clamp(0, self.world_width, self.view.width)
+        self.y = self.clamp(0, self.world_height, self.view.height)
+
+    @staticmethod
+    def clamp(pos, world, view):
+        if world <= view:
+            return -((view - world) // 2)
+        return max(0, min(pos, world - view))
+
+    @staticmethod
+    def world_center(row, col):
+        return (col * TILE_SIZE + TILE_SIZE / 2, row * TILE_SIZE + TILE_SIZE / 2)
+
+    def follow(self, row, col):
+        center_x, center_y = self.world_center(row, col)
+        self.x = self.clamp(int(center_x) - self.view.width // 2, self.world_width, self.view.width)
+        self.y = self.clamp(int(center_y) - self.view.height // 2, self.world_height, self.view.height)
+
+    @property
+    def offset(self):
+        # Что прибавить к мировым координатам, чтобы получить экранные
+        return (self.view.x - self.x, self.view.y - self.y)
+
+    def tile_rect(self, row, col):
+        off_x, off_y = self.offset
+        return pygame.Rect(off_x + col * TILE_SIZE, off_y + row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+
+    def visible_range(self, cell_px, rows, cols):
+        # Диапазоны строк и столбцов сетки с шагом cell_px, пересекающих видимую область
+        first_row = max(0, self.y // cell_px)
+        first_col = max(0, self.x // cell_px)
+        last_row = min(rows, (self.y + self.view.height - 1) // cell_px + 1)
+        last_col = min(cols, (self.x + self.view.width - 1) // cell_px + 1)
+        return first_row, last_row, first_col, last_col
+
+
+# --- Статичный слой лабиринта ---
+# Лабиринт нарезан на чанки CHUNK_TILES x CHUNK_TILES клеток. Чанк отрисовывается один раз
+# при первом попадании в кадр и хранится в LRU-кэше, поэтому кадр стоит столько блитов,
+# сколько чанков видно, независимо от размера лабиринта.
+class MazeLayer:
+    def __init__(self, maze, exit_image, chunk_tiles=CHUNK_TILES, max_chunks=MAX_CACHED_CHUNKS):
+        self.maze = maze
+        self.exit_image = exit_image
+        self.chunk_tiles = chunk_tiles
+        self.chunk_px = chunk_tiles * TILE_SIZE
+        self.chunk_rows = (maze.rows + chunk_tiles - 1) // chunk_tiles
+        self.chunk_cols = (maze.cols + chunk_tiles - 1) // chunk_tiles
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        self.builds = 0
+
+    def chunk(self, c_row, c_col):
+        key = (c_row, c_col)
+        surf = self.chunks.get(key)
+        if surf is not None:
+            self.chunks.move_to_end(key)
+            return surf
+        surf = self.build_chunk(c_row, c_col)
+        self.chunks[key] = surf
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return surf
 
-# --- Функции для рисования и загрузки ресурсов ---
+    def build_chunk(self, c_row, c_col):
+        maze = self.maze
+        row0, col0 = c_row * self.chunk_tiles, c_col * self.chunk_tiles
+        rows = min(self.chunk_tiles, maze.rows - row0)
+        cols = min(self.chunk_tiles, maze.cols - col0)
+        layer = surface_counter.add(pygame.Surface((cols*TILE_SIZE, rows*TILE_SIZE), pygame.SRCALPHA))
+        for row in range(rows):
+            for col in range(cols):
+                rect = pygame.Rect(col*TILE_SIZE, row*TILE_SIZE, TILE_SIZE, TILE_SIZE)
+                if maze.is_wall(row0 + row, col0 + col):
+                    pygame.draw.rect(layer, WALL_COLOR, rect)
+                pygame.draw.rect(layer, GRID_COLOR, rect, 1)
+        exit_row, exit_col = maze.exit[0] - row0, maze.exit[1] - col0
+        if 0 <= exit_row < rows and 0 <= exit_col < cols:
+            layer.blit(self.exit_image, (exit_col*TILE_SIZE, exit_row*TILE_SIZE))
+        self.builds += 1
+        # Переводим в формат дисплея, чтобы блит каждый кадр был максимально быстрым
+        return surface_counter.add(layer.convert_alpha())
+
+    def draw(self, surface, camera):
+        off_x, off_y = camera.offset
+        first_row, last_row, first_col, last_col = camera.visible_range(self.chunk_px, self.chunk_rows, self.chunk_cols)
+        surface.blits([(self.chunk(c_row, c_col), (off_x + c_col*self.chunk_px, off_y + c_row*self.chunk_px))
+                       for c_row in range(first_row, last_row)
+                       for c_col in range(first_col, last_col)], False)
+
+
+# --- Туман войны ---
+# Затемнение видимой части лабиринта собирается в одну поверхность: карта «одна клетка -
+# один пиксель» заполняется из bytearray видимости и исследованности через NumPy,
+# растягивается до размера клеток, и поверх нее режимом MAX накладывается заранее
+# нарисованная маска света. Поверхность пересобирается только при смене видимости или
+# диапазона видимых клеток; в остальных кадрах это один блит.
+class FogLayer:
+    def __init__(self, visibility):
+        self.visibility = visibility
+        rows, cols = visibility.rows, visibility.cols
+        # Представления NumPy поверх bytearray без копирования
+        self.explored = np.frombuffer(visibility.explored, dtype=np.uint8).reshape(rows, cols)
+        self.visible = np.frombuffer(visibility.visible, dtype=np.uint8).reshape(rows, cols)
+        self.light_mask = self.build_light_mask(visibility.radius)
+        self.tiles = None    # Карта затемнения: пиксель на клетку
+        self.surface = None  # Та же карта в размер клеток с маской света
+        self.key = None
+        self.rebuilds = 0
+
+    @staticmethod
+    def build_light_mask(radius):
+        # Черная маска с альфой, растущей от центра к краю круга света
+        size = (2 * radius + 1) * TILE_SIZE
+        coords = np.arange(size) - (size - 1) / 2
+        dist = np.hypot(coords[:, None], coords[None, :]) / ((radius + 0.5) * TILE_SIZE)
+        alpha = (np.clip(dist, 0.0, 1.0) ** 2 * FOG_LIGHT_EDGE_ALPHA).astype(np.uint8)
+        mask = surface_counter.add(pygame.Surface((size, size), pygame.SRCALPHA))
+        mask.fill((0, 0, 0, 0))
+        pygame.surfarray.pixels_alpha(mask)[:] = alpha
+        return mask
+
+    def rebuild(self, first_row, last_row, first_col, last_col):
+        visible = self.visible[first_row:last_row, first_col:last_col]
+        explored = self.explored[first_row:last_row, first_col:last_col]
+        alpha = np.where(visible, 0, np.where(explored, FOG_EXPLORED_ALPHA, 255)).astype(np.uint8)
+        size = (last_col - first_col, last_row - first_row)
+        # Поверхности переиспользуются, пока не изменится число видимых клеток
+        if self.tiles is None or self.tiles.get_size() != size:
+            self.tiles = surface_counter.add(pygame.Surface(size, pygame.SRCALPHA))
+            self.tiles.fill((0, 0, 0, 255))
+            self.surface = surface_counter.add(
+                pygame.Surface((size[0] * TILE_SIZE, size[1] * TILE_SIZE), pygame.SRCALPHA))
+        pygame.surfarray.pixels_alpha(self.tiles)[:] = alpha.T  # surfarray индексируется как (x, y)
+        fog = pygame.transform.scale(self.tiles, self.surface.get_size(), self.surface)  # В готовую поверхность
+        origin = self.visibility.origin
+        if origin is not None:
+            center_x = (origin[1] - first_col) * TILE_SIZE + TILE_SIZE // 2
+            center_y = (origin[0] - first_row) * TILE_SIZE + TILE_SIZE // 2
+            mask_rect = self.light_mask.get_rect(center=(center_x, center_y))
+            fog.blit(self.light_mask, mask_rect, special_flags=pygame.BLEND_RGBA_MAX)
+        self.rebuilds += 1
+
+    def draw(self, surface, camera):
+        rows, cols = self.visibility.rows, self.visibility.cols
+        first_row, last_row, first_col, last_col = camera.visible_range(TILE_SIZE, rows, cols)
+        if first_row >= last_row or first_col >= last_col:
+            return
+        key = (first_row, last_row, first_col, last_col, self.visibility.version)
+        if key != self.key:
+            self.rebuild(first_row, last_row, first_col, last_col)
+            self.key = key
+        off_x, off_y = camera.offset
+        surface.blit(self.surface, (off_x + first_col * TILE_SIZE, off_y + first_row * TILE_SIZE))
+
+
+# --- Кэш отрисованного текста ---
+# font.render дорогой, а тексты на экранах почти не меняются, поэтому готовые
+# поверхности хранятся по ключу (текст, шрифт, цвет) с вытеснением давно не использованных (LRU)
+class TextCache:
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font, color):
+        key = (text, font, tuple(color))
+        surf = self.items.get(key)
+        if surf is not None:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = surface_counter.add(font.render(text, True, color))
+        self.items[key] = surf
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self.items.clear()
+
+text_cache = TextCache()
+
+# --- Функции для рисования ---
 def draw_text_with_shadow(surface, text, font, color, pos, shadow_color=BLACK, offset=(2,2)):
-    surface.blit(font.render(text, True, shadow_color), (pos[0]+offset[0], pos[1]+offset[1]))
-    surface.blit(font.render(text, True, color), pos)
+    surface.blit(text_cache.render(text, font, shadow_color), (pos[0]+offset[0], pos[1]+offset[1]))
+    surface.blit(text_cache.render(text, font, color), pos)
 
 def draw_button(surface, text, font, center, padding=10):
-    txt_surf = font.render(text, True, BUTTON_TEXT_COLOR)
+    txt_surf = text_cache.render(text, font, BUTTON_TEXT_COLOR)
     txt_rect = txt_surf.get_rect(center=center)
     btn_rect = txt_rect.inflate(padding*2, padding*2)
     pygame.draw.rect(surface, BUTTON_COLOR, btn_rect, border_radius=8)
     pygame.draw.rect(surface, GRID_COLOR, btn_rect, 2, border_radius=8)
-    surface.blit(font.render(text, True, BLACK), txt_rect.move(2,2))
+    surface.blit(text_cache.render(text, font, BLACK), txt_rect.move(2,2))
     surface.blit(txt_surf, txt_rect)
 
-def load_sound(name):
-    fullname = os.path.join('data', name)
-    if not os.path.exists(fullname):
-        print("Звуковой файл", fullname, "не найден")
-        return None
-    try:
-        return pygame.mixer.Sound(fullname)
-    except pygame.error:
-        print("Невозможно загрузить звук:", name)
-        return None
+def merge_rects(rects):
+    # Объединяет пересекающиеся прямоугольники, чтобы не перерисовывать одну область дважды
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
 
-def load_image(name):
-    fullname = os.path.join('data', name)
-    if not os.path.exists(fullname):
-        print("Изображение", fullname, "не найдено")
-        return None
-    try:
-        return pygame.image.load(fullname).convert_alpha()
-    except pygame.error:
-        print("Невозможно загрузить изображение:", name)
-        return None
+# --- Ввод движения ---
+# Нажатия стрелок копятся в очереди и расходуются по одному ходу на шаг логики, поэтому
+# несколько нажатий между кадрами не теряются. Удерживаемая стрелка повторяет ход: первый
+# повтор через repeat_delay шагов логики, далее каждые repeat_interval шагов. Повторы
+# считаются в шагах логики и не зависят от частоты кадров.
+class MoveInput:
+    def __init__(self, repeat_delay, repeat_interval, buffer_size=INPUT_BUFFER):
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        self.buffer_size = buffer_size
+        self.queue = deque()     # (код хода, время нажатия по perf_counter или None для повтора)
+        self.held = []           # Удерживаемые направления, последнее нажатое - в конце
+        self.next_repeat = None  # Шаг логики следующего повтора
+        self.last_move_tick = None
+
+    def press(self, code, tick, stamp):
+        # При переполнении новые нажатия отбрасываются, чтобы не менять порядок ходов
+        if len(self.queue) < self.buffer_size:
+            self.queue.append((code, stamp))
+        if code in self.held:
+            self.held.remove(code)
+        self.held.append(code)
+        self.next_repeat = tick + self.repeat_delay
+
+    def release(self, code):
+        if code in self.held:
+            self.held.remove(code)
+        if not self.held:
+            self.next_repeat = None
 
-def is_dead_end(maze, row, col):
-    if maze[row][col] != 0:
-        return False
-    walls = 0
-    for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-        if maze[row+dr][col+dc] == 1:
-            walls += 1
-    return walls >= 3
+    def repeat(self, tick):
+        # Повтор добавляется, только когда очередь пуста: удержание не копит отставание
+        if self.held and not self.queue and self.next_repeat is not None and tick >= self.next_repeat:
+            self.queue.append((self.held[-1], None))
+            self.next_repeat = tick + self.repeat_interval
+
+    def pop(self, tick):
+        if not self.queue or self.last_move_tick == tick:
+            return None
+        self.last_move_tick = tick
+        return self.queue.popleft()
+
+    def clear(self):
+        self.queue.clear()
+        self.held.clear()
+        self.next_repeat = None
+        self.last_move_tick = None
+
+def default_player_name():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "Игрок"
 
 # --- Основной класс игры ---
 class MazeGame:
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.init()
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Лабиринт")
+    def __init__(self, dirty_rects=False, maze=None, tick_rate=TICK_RATE, fps=FPS, vsync=False,
+                 max_frame_skip=MAX_FRAME_SKIP, asset_cache=True, audio=True, record_dir=None, ghost=True,
+                 scores_path=SCORES_DB, player=None, repeat_delay=REPEAT_DELAY_MS,
+                 repeat_interval=REPEAT_INTERVAL_MS, smooth=True, fog=False, fog_radius=FOG_RADIUS, race=None):
+        self.launch_time = time.perf_counter()
+        # Профилировщик создается первым: фазы запуска пишутся в него же, см. report_startup
+        self.profiler = FrameProfiler()  # Замеры фаз кадра для HUD отладки (K_d) и экспорта
+        # Поднимаются только нужные подсистемы: pygame.init() инициализирует все, включая джойстики
+        with self.profiler.phase('init_display'):
+            pygame.display.init()
+            pygame.font.init()
+            self.screen, self.vsync = self.create_window(vsync)
+            pygame.display.set_caption("Лабиринт")
+        with self.profiler.phase('init_audio'):
+            audio_ready = init_mixer() if audio else False
         self.clock = pygame.time.Clock()
+        # Фиксированный шаг логики: накопитель реального времени расходуется шагами по tick_dt,
+        # остаток (alpha) используется для интерполяции при отрисовке
+        self.fps = 0 if self.vsync else fps
+        self.tick_rate = tick_rate
+        self.tick_dt = 1.0 / tick_rate
+        self.max_frame_skip = max_frame_skip
+        self.tick = 0
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.last_step_time = None
         self.state = 'SPLASH'
         self.debug_mode = False
         self.splash_sound_played = False
-        self.load_resources()
-        self.font_large = pygame.font.SysFont("Arial", 48)
-        self.font_medium = pygame.font.SysFont("Arial", 32)
-        self.font_small = pygame.font.SysFont("Arial", 24)
-        self.player_pos = list(START_POS)
-        self.start_time = None
-        self.elapsed_time = 0
-        self.best_time = self.load_best_time()
-        self.dead_end_triggered = False
+        with self.profiler.phase('assets'):
+            self.assets = AssetManager(cache_dir=ASSET_CACHE_DIR if asset_cache else None)
+            self.audio = AudioManager(self.assets.sound, SOUND_ASSETS) if audio_ready else NullAudio()
+            self.load_resources()
+        with self.profiler.phase('fonts'):
+            # Путь к шрифту находится один раз и кэшируется на диске, вместо SysFont на каждый размер
+            self.font_large = self.assets.font(FONT_NAME, 48)
+            self.font_medium = self.assets.font(FONT_NAME, 32)
+            self.font_small = self.assets.font(FONT_NAME, 24)
+        # Вся логика игры живет в GameCore, время для него берется из часов pygame
+        with self.profiler.phase('maze_index'):
+            self.maze = maze if maze is not None else Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS)
+            self.index = MazeIndex(self.maze)  # Тупики, расстояния до выхода и кратчайший путь
+        # Время игры считается в шагах логики, поэтому таймер не зависит от рывков кадров
+        self.core = GameCore(self.maze, clock=self.game_time, index=self.index)
+        self.show_hint = False
+        # Результаты пишет и читает фоновый поток ScoreStore; ответы на запросы (Future)
+        # забираются в poll_scores, поэтому кадр не ждет базу. Без scores_path результаты не хранятся.
+        self.scores = ScoreStore(scores_path) if scores_path else None
+        self.player_name = player or default_player_name()
+        self.best_time = None
+        self.best_time_request = None
+        self.leaderboard = None          # (строки страницы, всего результатов) или None, пока идет запрос
+        self.leaderboard_page = 0
+        self.leaderboard_request = None
+        # Запись забега: шаги считаются от run_start_tick, см. reset_game и move_player
+        self.maze_hash = maze_hash(self.maze)
+        self.import_legacy_record()
+        self.request_best_time()
+        self.run_start_tick = 0
+        self.run_seed = 0
+        self.recorder = None
+        self.record_dir = record_dir  # Каталог для записей всех законченных забегов
+        self.playback = None          # Воспроизводимые ходы: список (шаг, ход) и позиция в нем
+        self.playback_pos = 0
+        self.ghost_enabled = ghost
+        self.ghost_replay = None      # Лучший забег на этом лабиринте
+        self.ghost_events = ()
+        self.ghost_next = 0
+        self.ghost_pos = None
+        self.ghost_sprite = None
+        # Движение: очередь ввода и плавный переезд спрайта из клетки в клетку
+        self.input = MoveInput(self.ms_to_ticks(repeat_delay), self.ms_to_ticks(repeat_interval))
+        self.smooth = smooth
+        self.move_duration = self.input.repeat_interval * self.tick_dt
+        self.move_from = None      # Откуда едет спрайт (дробные строка и столбец)
+        self.move_time = 0.0
+        self.render_time = 0.0     # Момент, на который рисуется текущий кадр
+        self.pending_latency = []  # Время нажатий, ходы которых еще не выведены на экран
+        # Туман войны: видимость пересчитывается при смене клетки игрока, см. move_player
+        self.fog_radius = fog_radius if fog else 0
+        self.init_fog()
+        # Гонка: лабиринт и позиции соперников приходят от сервера (race_server.RaceClient),
+        # сокет опрашивается без блокировки в handle_events, ходы отправляются из move_player
+        self.race = race
         self.splash_start_time = pygame.time.get_ticks()
-        self.maze_surface = pygame.Surface((len(MAZE_LAYOUT[0])*TILE_SIZE, len(MAZE_LAYOUT)*TILE_SIZE), pygame.SRCALPHA)
+        self.maze_layer = None  # Кэш статичного слоя лабиринта, см. build_maze_layer
+        self.camera = Camera(self.screen.get_rect(), (self.maze.cols*TILE_SIZE, self.maze.rows*TILE_SIZE))
         self.update_count = 0
-        self.particles = []  # Список для частиц
+        with self.profiler.phase('particles'):
+            self.particles = ParticleSystem()  # Пул частиц (первый вызов импортирует numpy.random)
+        self.menu_background = None  # Фон + затемнение, см. dimmed_background
+        self.screen_cache = {}  # Собранные статичные экраны: имя -> (ключ содержимого, Surface)
+        self.screen_builds = 0
+        self.last_cache_misses = 0
+        self.last_surfaces = 0
+        self.hud_panel = None
+        # Режим грязных прямоугольников: перерисовываются и выводятся только изменившиеся области
+        self.dirty_rects = dirty_rects
+        self.last_frame_key = None  # Что было выведено на экран в прошлом кадре
+        self.last_regions = {}      # Области прошлого кадра: игрок, частицы, таймер
+        self.startup_times = dict(self.profiler.current)
+        self.startup_times['total'] = (time.perf_counter() - self.launch_time) * 1000
+
+    def report_startup(self):
+        print("Запуск игры (мс):")
+        for name, ms in self.startup_times.items():
+            print(f"  {name:14s} {ms:8.1f}")
+        print(f"  {'first_frame':14s} {(time.perf_counter() - self.launch_time) * 1000:8.1f}")
 
     def load_resources(self):
-        self.player_image = load_image("player.png")
-        if self.player_image is None:
-            self.player_image = pygame.Surface((TILE_SIZE, TILE_SIZE))
-            self.player_image.fill(BLUE)
-        else:
-            self.player_image = pygame.transform.scale(self.player_image, (TILE_SIZE, TILE_SIZE))
-        self.exit_image = load_image("exit.png")
-        if self.exit_image is None:
-            self.exit_image = pygame.Surface((TILE_SIZE, TILE_SIZE))
-            self.exit_image.fill(GREEN)
-        else:
-            self.exit_image = pygame.transform.scale(self.exit_image, (TILE_SIZE, TILE_SIZE))
-        self.background_image = load_image("background.png")
-        if self.background_image is None:
-            self.background_image = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-            self.background_image.fill(GRAY)
+        # Декодирование идет в фоне, пока показывается заставка; поверхности и звуки забираются
+        # из AssetManager при первом обращении (изображения - свойства ниже, звуки - AudioManager)
+        self.assets.preload(images=[(name, size) for name, size, _ in IMAGE_ASSETS.values()],
+                            sounds=[name for name, _ in SOUND_ASSETS.values()] if self.audio.enabled else ())
+        if self.audio.enabled and self.assets.exists(MUSIC_FILE):
+            self.audio.play_music(self.assets.path(MUSIC_FILE), volume=0.5)
+
+    def image(self, key):
+        return self.assets.image(*IMAGE_ASSETS[key])
+
+    @property
+    def player_image(self):
+        return self.image('player')
+
+    @property
+    def exit_image(self):
+        return self.image('exit')
+
+    @property
+    def background_image(self):
+        return self.image('background')
+
+    # --- Результаты и таблица рекордов ---
+
+    def import_legacy_record(self):
+        # Прежние версии хранили одно лучшее время встроенного лабиринта в текущем каталоге
+        if self.scores is not None and os.path.exists(LEGACY_RECORD):
+            default_maze = Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS)
+            self.scores.import_record(LEGACY_RECORD, maze_hash(default_maze).hex(), self.player_name)
+
+    def request_best_time(self):
+        self.best_time = None
+        if self.scores is not None:
+            self.best_time_request = self.scores.best_time(self.maze_hash.hex())
+
+    def save_run(self, time_taken, moves):
+        if self.scores is not None:
+            self.scores.add_run(self.maze_hash.hex(), self.player_name, time_taken, moves)
+
+    def open_leaderboard(self, page=0):
+        self.leaderboard_page = max(0, page)
+        self.leaderboard = None
+        if self.scores is not None:
+            self.leaderboard_request = self.scores.page(self.maze_hash.hex(), self.leaderboard_page, LEADERBOARD_PAGE)
         else:
-            self.background_image = pygame.transform.scale(self.background_image, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.move_sound = load_sound("move.wav")
-        self.dead_end_sound = load_sound("dead_end.wav")
-        self.splash_sound = load_sound("splash.wav")
-        self.game_over_sound = load_sound("game_over.wav")
-        music_file = os.path.join("data", "background_music.wav")
-        if os.path.exists(music_file):
-            try:
-                pygame.mixer.music.load(music_file)
-                pygame.mixer.music.set_volume(0.5)
-                pygame.mixer.music.play(-1)
-            except Exception as e:
-                print("Ошибка загрузки фоновой музыки:", e)
-
-    def load_best_time(self):
-        best = None
-        if os.path.exists("record.txt"):
+            self.leaderboard = ([], 0)
+
+    def leaderboard_pages(self):
+        total = self.leaderboard[1] if self.leaderboard is not None else 0
+        return max(1, (total + LEADERBOARD_PAGE - 1) // LEADERBOARD_PAGE)
+
+    def poll_scores(self):
+        # Забирает готовые ответы фонового потока; незавершенные запросы не ждет
+        request = self.best_time_request
+        if request is not None and request.done():
+            self.best_time_request = None
+            best = request.result() if request.exception() is None else None
+            if best is not None and (self.best_time is None or best < self.best_time):
+                self.best_time = best
+        request = self.leaderboard_request
+        if request is not None and request.done():
+            self.leaderboard_request = None
+            self.leaderboard = request.result() if request.exception() is None else ([], 0)
+
+    # --- Записи забегов и призрак ---
+
+    def ghost_path(self):
+        return os.path.join(GHOST_DIR, f"best-{self.maze_hash.hex()}.mzr")
+
+    def load_ghost(self):
+        path = self.ghost_path()
+        if not os.path.exists(path):
+            return None
+        try:
+            replay = Replay.load(path)
+        except (OSError, ValueError) as e:
+            print("Ошибка чтения записи призрака:", e)
+            return None
+        if replay.maze_hash != self.maze_hash or replay.tick_rate != self.tick_rate:
+            return None
+        return replay
+
+    def reset_ghost(self):
+        if not self.ghost_enabled:
+            return
+        if self.ghost_replay is None:
+            self.ghost_replay = self.load_ghost()
+        self.ghost_events = list(self.ghost_replay.events()) if self.ghost_replay is not None else ()
+        self.ghost_next = 0
+        self.ghost_pos = self.maze.start if self.ghost_events else None
+
+    def update_ghost(self):
+        # Призрак повторяет ходы лучшего забега в те же шаги логики, как и игрок - не больше
+        # одного за шаг; ходы в записи заведомо допустимы
+        events = self.ghost_events
+        now = self.run_tick()
+        row, col = self.ghost_pos
+        if self.ghost_next < len(events) and events[self.ghost_next][0] <= now:
+            d_row, d_col = DIRECTIONS[events[self.ghost_next][1]]
+            row, col = row + d_row, col + d_col
+            self.ghost_next += 1
+        self.ghost_pos = (row, col)
+
+    def finish_recording(self, replay, finished):
+        if self.record_dir:
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.maze_hash.hex()[:8]}.mzr"
             try:
-                with open("record.txt", "r") as f:
-                    best = float(f.read().strip())
-            except Exception as e:
-                print("Ошибка чтения рекорда:", e)
-        return best
+                os.makedirs(self.record_dir, exist_ok=True)
+                replay.save(os.path.join(self.record_dir, name))
+            except OSError as e:
+                print("Ошибка сохранения записи:", e)
+        if not finished or not self.ghost_enabled:
+            return
+        if self.ghost_replay is None or replay.last_tick < self.ghost_replay.last_tick:
+            self.ghost_replay = replay
+            self.save_ghost(replay)
 
-    def save_best_time(self, time_taken):
+    def save_ghost(self, replay):
         try:
-            with open("record.txt", "w") as f:
-                f.write(str(time_taken))
-        except Exception as e:
-            print("Ошибка сохранения рекорда:", e)
+            os.makedirs(GHOST_DIR, exist_ok=True)
+            replay.save(self.ghost_path())
+        except OSError as e:
+            print("Ошибка сохранения записи призрака:", e)
+
+    def start_replay(self, replay):
+        # Воспроизведение через move_player: те же звуки, частицы (с тем же зерном) и время
+        if replay.maze_hash != self.maze_hash:
+            raise ValueError("Запись сделана на другом лабиринте")
+        if replay.tick_rate != self.tick_rate:
+            raise ValueError(f"Запись сделана при {replay.tick_rate} шагах логики в секунду")
+        self.reset_game(seed=replay.seed, record=False)
+        self.playback = list(replay.events())
+        self.playback_pos = 0
+        self.state = 'GAME'
+
+    def play_moves(self):
+        # Как и при вводе с клавиатуры, не больше одного хода за шаг логики
+        events = self.playback
+        now = self.run_tick()
+        if self.playback_pos < len(events) and events[self.playback_pos][0] <= now:
+            d_row, d_col = DIRECTIONS[events[self.playback_pos][1]]
+            self.playback_pos += 1
+            self.move_player(d_row, d_col)
+
+    def replay_headless(self, replay):
+        # Прогон записи на максимальной скорости без отрисовки; возвращает время забега
+        self.start_replay(replay)
+        self.advance(replay.last_tick + 1)
+        return self.elapsed_time if self.core.finished else None
+
+    @property
+    def player_pos(self):
+        return self.core.player_pos
+
+    @property
+    def elapsed_time(self):
+        return self.core.elapsed
+
+    @property
+    def par_time(self):
+        return self.index.optimal_length * PAR_SECONDS_PER_MOVE
 
-    def reset_game(self):
-        self.player_pos = list(START_POS)
-        self.start_time = pygame.time.get_ticks()
-        self.elapsed_time = 0
-        self.dead_end_triggered = False
+    def hint_cell(self):
+        # Следующая клетка кратчайшего пути к выходу
+        code = self.index.next_step(*self.player_pos)
+        if code is None:
+            return None
+        d_row, d_col = DIRECTIONS[code]
+        return self.player_pos[0] + d_row, self.player_pos[1] + d_col
+
+    def init_fog(self):
+        if not self.fog_radius:
+            self.visibility = None
+            self.fog_layer = None
+            return
+        self.visibility = Visibility(self.maze, self.fog_radius, self.index)
+        self.fog_layer = FogLayer(self.visibility)
+
+    def ms_to_ticks(self, ms):
+        return max(1, round(ms * self.tick_rate / 1000))
+
+    def reset_game(self, seed=None, record=True):
+        self.core.reset()
+        self.input.clear()
+        self.move_from = None
+        self.pending_latency.clear()
+        if self.visibility is not None:
+            self.visibility.reset()
+            self.visibility.update(*self.player_pos)
+        self.camera.follow(*self.player_pos)
+        self.run_start_tick = self.tick
+        self.run_seed = seed if seed is not None else random.getrandbits(32)
+        self.particles.clear()
+        self.particles.reseed(self.run_seed)
+        self.recorder = Replay(self.maze_hash, self.run_seed, self.tick_rate) if record else None
+        self.playback = None
+        self.reset_ghost()
+
+    def run_tick(self):
+        # Номер шага логики от начала текущего забега
+        return self.tick - self.run_start_tick
+
+    def set_maze(self, maze):
+        # Смена лабиринта: новое ядро игры и перестройка статичного слоя
+        self.maze = maze
+        self.index = MazeIndex(maze)
+        self.maze_hash = maze_hash(maze)
+        self.request_best_time()
+        self.core = GameCore(maze, clock=self.core.clock, index=self.index)
+        self.ghost_replay = None
+        self.init_fog()
+        self.camera = Camera(self.screen.get_rect(), (maze.cols*TILE_SIZE, maze.rows*TILE_SIZE))
+        self.invalidate_maze_layer()
 
     def spawn_particles(self, pos, count, color, lifetime, size, speed_range):
-        for _ in range(count):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(0, speed_range)
-            velocity = (math.cos(angle) * speed, math.sin(angle) * speed)
-            p = Particle(pos, velocity, lifetime, color, size)
-            self.particles.append(p)
+        self.particles.spawn(pos, count, color, lifetime, size, speed_range)
 
     def update_particles(self, dt):
-        for p in self.particles:
-            p.update(dt)
-        self.particles = [p for p in self.particles if p.lifetime > 0]
+        self.particles.update(dt)
 
     def draw_particles(self, surface):
-        for p in self.particles:
-            p.draw(surface)
+        # Частицы рисуются с упреждением на долю шага, прошедшую после последнего шага логики
+        self.particles.draw(surface, self.camera.offset, self.alpha * self.tick_dt)
 
     def handle_events(self):
+        if self.race is not None:
+            self.race.poll()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                self.quit()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_d:
                     self.debug_mode = not self.debug_mode
@@ -229,132 +823,261 @@ class MazeGame:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_s:
                         self.reset_game()
-                        self.start_time = pygame.time.get_ticks()
+                        if self.race is not None:
+                            self.race.send_reset()
                         self.state = 'GAME'
                     elif event.key == pygame.K_q:
-                        pygame.quit()
-                        sys.exit()
+                        self.quit()
                     elif event.key == pygame.K_r:
+                        self.open_leaderboard()
                         self.state = 'RECORD'
                     elif event.key == pygame.K_a:
                         self.state = 'ABOUT'
             elif self.state == 'GAME':
                 if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_UP:
-                        self.move_player(-1, 0)
-                    elif event.key == pygame.K_DOWN:
-                        self.move_player(1, 0)
-                    elif event.key == pygame.K_LEFT:
-                        self.move_player(0, -1)
-                    elif event.key == pygame.K_RIGHT:
-                        self.move_player(0, 1)
-            elif self.state in ('GAME_OVER', 'RECORD', 'ABOUT'):
+                    if event.key in MOVE_KEYS:
+                        # Во время воспроизведения записи ходы с клавиатуры не принимаются
+                        if self.playback is None:
+                            self.input.press(MOVE_KEYS[event.key], self.tick, time.perf_counter())
+                    elif event.key == pygame.K_h:
+                        self.show_hint = not self.show_hint
+                elif event.type == pygame.KEYUP and event.key in MOVE_KEYS:
+                    self.input.release(MOVE_KEYS[event.key])
+            elif self.state == 'RECORD':
+                if event.type == pygame.KEYDOWN:
+                    if event.key in (pygame.K_LEFT, pygame.K_PAGEUP):
+                        if self.leaderboard_page > 0:
+                            self.open_leaderboard(self.leaderboard_page - 1)
+                    elif event.key in (pygame.K_RIGHT, pygame.K_PAGEDOWN):
+                        if self.leaderboard_page + 1 < self.leaderboard_pages():
+                            self.open_leaderboard(self.leaderboard_page + 1)
+                    else:
+                        self.state = 'MENU'
+            elif self.state in ('GAME_OVER', 'ABOUT'):
                 if event.type == pygame.KEYDOWN:
                     self.state = 'MENU'
 
-    def move_player(self, d_row, d_col):
-        new_row = self.player_pos[0] + d_row
-        new_col = self.player_pos[1] + d_col
-        if new_row < 0 or new_row >= len(MAZE_LAYOUT) or new_col < 0 or new_col >= len(MAZE_LAYOUT[0]):
+    def apply_input(self):
+        # Не больше одного хода за шаг логики; ход применяется сразу после опроса событий,
+        # не дожидаясь следующего шага, чтобы не добавлять задержку ввода
+        entry = self.input.pop(self.tick)
+        if entry is None:
             return
-        if MAZE_LAYOUT[new_row][new_col] == 1:
+        code, stamp = entry
+        self.move_player(*DIRECTIONS[code])
+        if stamp is not None:
+            self.pending_latency.append(stamp)
+
+    def move_player(self, d_row, d_col):
+        sprite_pos = self.sprite_pos()
+        result = self.core.move_by(d_row, d_col)
+        if not result.moved:
             return
-        self.player_pos = [new_row, new_col]
-        if self.move_sound:
-            self.move_sound.play()
-
-        # Расчет позиции игрока в пикселях (для эффекта частиц)
-        maze_width = len(MAZE_LAYOUT[0]) * TILE_SIZE
-        maze_height = len(MAZE_LAYOUT) * TILE_SIZE
-        maze_x = (WINDOW_WIDTH - maze_width) // 2
-        maze_y = (WINDOW_HEIGHT - maze_height) // 2
-        player_pixel = (maze_x + self.player_pos[1] * TILE_SIZE + TILE_SIZE/2,
-                        maze_y + self.player_pos[0] * TILE_SIZE + TILE_SIZE/2)
+        self.move_from = sprite_pos
+        self.move_time = time.perf_counter()
+        if self.visibility is not None:
+            self.visibility.update(*self.player_pos)
+        if self.recorder is not None:
+            self.recorder.append(self.run_tick(), DIRECTION_CODES[(d_row, d_col)])
+        if self.race is not None and self.playback is None:
+            self.race.send_move(DIRECTION_CODES[(d_row, d_col)])
+        # Частота и число одновременных звуков шагов ограничены AudioManager
+        self.audio.play('move')
+
+        # Частицы живут в координатах мира, камера сдвигает их при отрисовке
+        player_pixel = Camera.world_center(*self.player_pos)
         # Эффект частиц при шаге
         self.spawn_particles(player_pixel, count=5, color=GRAY, lifetime=0.5, size=3, speed_range=30)
 
-        if is_dead_end(MAZE_LAYOUT, new_row, new_col) and not self.dead_end_triggered:
-            if self.dead_end_sound:
-                self.dead_end_sound.play()
-            self.dead_end_triggered = True
-        else:
-            self.dead_end_triggered = False
+        if result.dead_end:
+            self.audio.play('dead_end')
 
-        if (new_row, new_col) == EXIT_POS:
+        if result.finished:
             # Эффект частиц при достижении выхода
             self.spawn_particles(player_pixel, count=20, color=YELLOW, lifetime=1.0, size=4, speed_range=60)
             self.state = 'GAME_OVER'
-            self.elapsed_time = (pygame.time.get_ticks() - self.start_time) / 1000.0
-            if self.game_over_sound:
-                self.game_over_sound.play()
-            if self.best_time is None or self.elapsed_time < self.best_time:
-                self.best_time = self.elapsed_time
-                self.save_best_time(self.best_time)
-
-    def update_game(self):
-        self.elapsed_time = (pygame.time.get_ticks() - self.start_time) / 1000.0
-        dt = self.clock.get_time() / 1000.0
-        self.update_particles(dt)
-        self.update_count += 1
+            self.input.clear()
+            self.audio.play('game_over')
+            if self.recorder is not None:
+                self.finish_recording(self.recorder, finished=True)
+                self.recorder = None
+            if self.playback is None:
+                self.save_run(self.elapsed_time, self.core.moves)
+                if self.best_time is None or self.elapsed_time < self.best_time:
+                    self.best_time = self.elapsed_time
+
+    def create_window(self, vsync):
+        if vsync:
+            # В pygame 2 вертикальная синхронизация доступна только вместе с SCALED или OPENGL
+            try:
+                return pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SCALED, vsync=1), True
+            except pygame.error as e:
+                print("VSync недоступен:", e)
+        return pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT)), False
+
+    def game_time(self):
+        return self.tick * self.tick_dt
+
+    def advance(self, ticks=1):
+        # Шаги логики без отрисовки: для ботов и прогонов быстрее реального времени
+        for _ in range(ticks):
+            self.update_tick()
+
+    def update_tick(self):
+        if self.state == 'GAME':
+            if self.playback is not None:
+                self.play_moves()
+            else:
+                self.input.repeat(self.tick)
+                self.apply_input()
+        self.tick += 1
+        if self.state == 'GAME':
+            self.update_game(self.tick_dt)
+
+    def update_game(self, dt):
+        self.camera.follow(*self.player_pos)
+        if self.ghost_events:
+            self.update_ghost()
+        with self.profiler.phase('particles_update'):
+            self.update_particles(dt)
+        self.update_count += 1  # Показывается в HUD отладки
 
     def draw_debug_info(self):
-        debug = self.font_small.render(f"DEBUG | Состояние: {self.state} | Позиция: {self.player_pos} | Обновлений: {self.update_count}", True, RED)
-        self.screen.blit(debug, (10, WINDOW_HEIGHT - 30))
+        # HUD профилировщика: фазы кадра (мс, среднее за историю), FPS, график времени кадра,
+        # число частиц, созданных за кадр поверхностей и промахов кэшей поверхностей
+        profiler = self.profiler
+        means = profiler.phase_means()
+        frame_ms = profiler.average(profiler.frame_times)
+        lines = [
+            f"FPS {profiler.fps():.0f} | кадр {frame_ms:.2f} мс | работа {profiler.average(profiler.work_times):.2f} мс",
+            " | ".join(f"{HUD_PHASES[name]} {means[name]:.2f}" for name in HUD_PHASES if name in means),
+            f"Частиц: {profiler.last('particles')} | Поверхностей/кадр: {profiler.counter_mean('surfaces'):.2f} | "
+            f"Промахов кэшей/кадр: {profiler.counter_mean('cache_misses'):.2f}",
+            "Ввод -> экран: ср. {:.1f} мс, макс. {:.1f} мс | ".format(*profiler.sample_stats('input_latency')) +
+            f"Звук: {self.audio.busy_channels()} кан., {self.audio.played} запусков, {self.audio.dropped} отброшено",
+            f"DEBUG | Состояние: {self.state} | Позиция: {self.player_pos} | Обновлений: {self.update_count}",
+        ]
+        line_height = self.font_small.get_linesize()
+        top = WINDOW_HEIGHT - line_height * len(lines) - 10
+        if self.hud_panel is None:
+            self.hud_panel = surface_counter.add(pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA))
+            self.hud_panel.fill((0, 0, 0, 150))
+        self.screen.blit(self.hud_panel, (0, top - 5), pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT - top + 5))
+        for idx, line in enumerate(lines):
+            debug = surface_counter.add(self.font_small.render(line, True, RED if idx == len(lines) - 1 else WHITE))
+            self.screen.blit(debug, (10, top + idx * line_height))
+        self.draw_frame_graph(pygame.Rect(WINDOW_WIDTH - HUD_GRAPH_SIZE[0] - 10, 10, *HUD_GRAPH_SIZE))
+
+    def draw_frame_graph(self, rect):
+        # График времени кадра; линия-ориентир - бюджет кадра при целевом FPS
+        frames = self.profiler.frame_times
+        self.screen.blit(self.hud_panel, rect, pygame.Rect(0, 0, rect.width, rect.height))
+        budget = 1000.0 / (self.fps or FPS)
+        scale = rect.height / (budget * 2)
+        budget_y = rect.bottom - int(budget * scale)
+        pygame.draw.line(self.screen, GREEN, (rect.left, budget_y), (rect.right - 1, budget_y))
+        if len(frames) > 1:
+            step = rect.width / (frames.maxlen - 1)
+            points = [(rect.left + i * step, max(rect.top, rect.bottom - 1 - ms * scale)) for i, ms in enumerate(frames)]
+            pygame.draw.lines(self.screen, YELLOW, False, points)
+
+    def dimmed_background(self):
+        # Фон с затемнением общий для всех экранов меню и собирается один раз
+        if self.menu_background is None:
+            background = surface_counter.add(self.background_image.copy())
+            overlay = surface_counter.add(pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA))
+            overlay.fill(DARK_OVERLAY)
+            background.blit(overlay, (0, 0))
+            self.menu_background = surface_counter.add(background.convert())
+        return self.menu_background
+
+    def draw_static_screen(self, name, key, compose):
+        # Статичный экран собирается целиком один раз; key описывает изменяемое содержимое
+        # (например, рекорд), и экран пересобирается только при его изменении
+        cached = self.screen_cache.get(name)
+        if cached is None or cached[0] != key:
+            surface = surface_counter.add(self.dimmed_background().copy())
+            compose(surface)
+            self.screen_builds += 1
+            cached = (key, surface)
+            self.screen_cache[name] = cached
+        self.screen.blit(cached[1], (0, 0))
 
     def draw_splash(self):
-        self.screen.blit(self.background_image, (0, 0))
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill(DARK_OVERLAY)
-        self.screen.blit(overlay, (0, 0))
+        self.draw_static_screen('SPLASH', None, self.compose_splash)
+        # Звук заставки запускается в первом кадре, когда фоновый поток его уже декодировал
+        if not self.splash_sound_played and self.assets.ready(SOUND_ASSETS['splash'][0]):
+            self.audio.play('splash')
+            self.splash_sound_played = True
+
+    def compose_splash(self, surface):
         title = "Добро пожаловать в Лабиринт!"
         instruction = "Нажмите любую клавишу для продолжения..."
         t_size = self.font_large.size(title)
         i_size = self.font_small.size(instruction)
         t_pos = ((WINDOW_WIDTH - t_size[0]) // 2, WINDOW_HEIGHT // 2 - 80)
         i_pos = ((WINDOW_WIDTH - i_size[0]) // 2, WINDOW_HEIGHT // 2 + 20)
-        draw_text_with_shadow(self.screen, title, self.font_large, WHITE, t_pos)
-        draw_text_with_shadow(self.screen, instruction, self.font_small, WHITE, i_pos)
-        if not self.splash_sound_played and self.splash_sound:
-            self.splash_sound.play()
-            self.splash_sound_played = True
+        draw_text_with_shadow(surface, title, self.font_large, WHITE, t_pos)
+        draw_text_with_shadow(surface, instruction, self.font_small, WHITE, i_pos)
 
     def draw_menu(self):
-        self.screen.blit(self.background_image, (0, 0))
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill(DARK_OVERLAY)
-        self.screen.blit(overlay, (0, 0))
+        self.draw_static_screen('MENU', None, self.compose_menu)
+
+    def compose_menu(self, surface):
         title = "Лабиринт"
         t_size = self.font_large.size(title)
         t_pos = ((WINDOW_WIDTH - t_size[0]) // 2, WINDOW_HEIGHT // 4)
-        draw_text_with_shadow(self.screen, title, self.font_large, YELLOW, t_pos)
-        draw_button(self.screen, "Нажмите S, чтобы начать", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 40))
-        draw_button(self.screen, "Нажмите R, чтобы посмотреть рекорд", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 10))
-        draw_button(self.screen, "Нажмите A, чтобы узнать об игре", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 60))
-        draw_button(self.screen, "Нажмите Q, чтобы выйти", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 110))
+        draw_text_with_shadow(surface, title, self.font_large, YELLOW, t_pos)
+        draw_button(surface, "Нажмите S, чтобы начать", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 40))
+        draw_button(surface, "Нажмите R, чтобы посмотреть рекорд", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 10))
+        draw_button(surface, "Нажмите A, чтобы узнать об игре", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 60))
+        draw_button(surface, "Нажмите Q, чтобы выйти", self.font_medium, (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 110))
 
     def draw_record(self):
-        self.screen.blit(self.background_image, (0, 0))
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill(DARK_OVERLAY)
-        self.screen.blit(overlay, (0, 0))
-        title = "Рекорд"
+        key = (self.leaderboard_page, self.leaderboard_key())
+        self.draw_static_screen('RECORD', key, self.compose_record)
+
+    def leaderboard_key(self):
+        if self.leaderboard is None:
+            return None
+        rows, total = self.leaderboard
+        return tuple(rows), total
+
+    def compose_record(self, surface):
+        title = "Рекорды"
         t_size = self.font_large.size(title)
-        t_pos = ((WINDOW_WIDTH - t_size[0]) // 2, WINDOW_HEIGHT // 4)
-        draw_text_with_shadow(self.screen, title, self.font_large, WHITE, t_pos)
-        rec_text = "Лучшее время: " + (f"{self.best_time:.2f} сек" if self.best_time is not None else "нет")
-        r_size = self.font_medium.size(rec_text)
-        r_pos = ((WINDOW_WIDTH - r_size[0]) // 2, WINDOW_HEIGHT // 2)
-        draw_text_with_shadow(self.screen, rec_text, self.font_medium, YELLOW, r_pos)
-        info = "Нажмите любую клавишу для возврата в меню."
+        t_pos = ((WINDOW_WIDTH - t_size[0]) // 2, 40)
+        draw_text_with_shadow(surface, title, self.font_large, WHITE, t_pos)
+        row_height = self.font_small.get_linesize() + 6
+        y = 130
+        if self.leaderboard is None:
+            draw_text_with_shadow(surface, "Загрузка...", self.font_medium, YELLOW, (80, y))
+        elif not self.leaderboard[0]:
+            draw_text_with_shadow(surface, "Результатов пока нет", self.font_medium, YELLOW, (80, y))
+        else:
+            first = self.leaderboard_page * LEADERBOARD_PAGE
+            for place, score in enumerate(self.leaderboard[0], first + 1):
+                date = time.strftime('%d.%m.%Y', time.localtime(score.created_at))
+                color = YELLOW if place == 1 else WHITE
+                draw_text_with_shadow(surface, f"{place}.", self.font_small, color, (80, y))
+                draw_text_with_shadow(surface, score.player[:20], self.font_small, color, (140, y))
+                draw_text_with_shadow(surface, f"{score.time:.2f} сек", self.font_small, color, (400, y))
+                draw_text_with_shadow(surface, f"{score.moves} ходов", self.font_small, color, (530, y))
+                draw_text_with_shadow(surface, date, self.font_small, GRID_COLOR, (660, y))
+                y += row_height
+            pages = f"Страница {self.leaderboard_page + 1} из {self.leaderboard_pages()}  (стрелки влево и вправо)"
+            p_size = self.font_small.size(pages)
+            draw_text_with_shadow(surface, pages, self.font_small, WHITE,
+                                  ((WINDOW_WIDTH - p_size[0]) // 2, WINDOW_HEIGHT - 120))
+        info = "Нажмите любую другую клавишу для возврата в меню."
         i_size = self.font_small.size(info)
         i_pos = ((WINDOW_WIDTH - i_size[0]) // 2, WINDOW_HEIGHT - 80)
-        draw_text_with_shadow(self.screen, info, self.font_small, RED, i_pos)
+        draw_text_with_shadow(surface, info, self.font_small, RED, i_pos)
 
     def draw_about(self):
-        self.screen.blit(self.background_image, (0, 0))
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill(DARK_OVERLAY)
-        self.screen.blit(overlay, (0, 0))
+        self.draw_static_screen('ABOUT', None, self.compose_about)
+
+    def compose_about(self, surface):
         title = "Об игре"
         about_lines = [
             "Это простая игра-лабиринт, разработанная с использованием PyGame.",
@@ -363,153 +1086,381 @@ class MazeGame:
             "Наслаждайтесь игрой и весёлитесь!"
         ]
         t_size = self.font_large.size(title)
-        draw_text_with_shadow(self.screen, title, self.font_large, WHITE, ((WINDOW_WIDTH-t_size[0])//2, 80))
+        draw_text_with_shadow(surface, title, self.font_large, WHITE, ((WINDOW_WIDTH-t_size[0])//2, 80))
         for idx, line in enumerate(about_lines):
             l_size = self.font_small.size(line)
             l_pos = ((WINDOW_WIDTH-l_size[0])//2, 150 + idx*40)
-            draw_text_with_shadow(self.screen, line, self.font_small, YELLOW, l_pos)
+            draw_text_with_shadow(surface, line, self.font_small, YELLOW, l_pos)
         info = "Нажмите любую клавишу для возврата в меню."
         i_size = self.font_small.size(info)
         i_pos = ((WINDOW_WIDTH-i_size[0])//2, WINDOW_HEIGHT-80)
-        draw_text_with_shadow(self.screen, info, self.font_small, RED, i_pos)
+        draw_text_with_shadow(surface, info, self.font_small, RED, i_pos)
 
-    def draw_maze(self):
-        self.maze_surface.fill((0, 0, 0, 0))
-        for row in range(len(MAZE_LAYOUT)):
-            for col in range(len(MAZE_LAYOUT[0])):
-                rect = pygame.Rect(col*TILE_SIZE, row*TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                if MAZE_LAYOUT[row][col] == 1:
-                    pygame.draw.rect(self.maze_surface, WALL_COLOR, rect)
-                pygame.draw.rect(self.maze_surface, GRID_COLOR, rect, 1)
-        exit_rect = pygame.Rect(EXIT_POS[1]*TILE_SIZE, EXIT_POS[0]*TILE_SIZE, TILE_SIZE, TILE_SIZE)
-        self.maze_surface.blit(self.exit_image, exit_rect)
+    def build_maze_layer(self):
+        # Статичный слой лабиринта: строится один раз и перестраивается только при смене лабиринта
+        self.maze_layer = MazeLayer(self.maze, self.exit_image)
 
-    def draw_game(self):
-        self.screen.blit(self.background_image, (0, 0))
-        self.draw_maze()
-        maze_width = len(MAZE_LAYOUT[0]) * TILE_SIZE
-        maze_height = len(MAZE_LAYOUT) * TILE_SIZE
-        maze_x = (WINDOW_WIDTH - maze_width) // 2
-        maze_y = (WINDOW_HEIGHT - maze_height) // 2
-        self.screen.blit(self.maze_surface, (maze_x, maze_y))
-        p_x = maze_x + self.player_pos[1] * TILE_SIZE
-        p_y = maze_y + self.player_pos[0] * TILE_SIZE
-        self.screen.blit(self.player_image, pygame.Rect(p_x, p_y, TILE_SIZE, TILE_SIZE))
-        timer = f"Время: {self.elapsed_time:.2f} сек"
-        draw_text_with_shadow(self.screen, timer, self.font_small, YELLOW, (10, 10))
-        # Отрисовка частиц (эффект частиц поверх всего)
-        self.draw_particles(self.screen)
+    def invalidate_maze_layer(self):
+        self.maze_layer = None
+
+    def draw_maze(self):
+        if self.maze_layer is None:
+            self.build_maze_layer()
+        self.maze_layer.draw(self.screen, self.camera)
 
     def draw_game_over(self):
-        self.screen.blit(self.background_image, (0, 0))
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill(DARK_OVERLAY)
-        self.screen.blit(overlay, (0, 0))
+        self.draw_static_screen('GAME_OVER', (self.elapsed_time, self.best_time, self.core.moves), self.compose_game_over)
+
+    def compose_game_over(self, surface):
         congrats = "Поздравляем!"
         your_time = f"Ваше время: {self.elapsed_time:.2f} сек"
         best_time = f"Лучшее время: {self.best_time:.2f} сек" if self.best_time is not None else "Лучшее время: N/A"
+        par = f"Эталон: {self.par_time:.2f} сек | Ходов: {self.core.moves} из {self.index.optimal_length} оптимальных"
         restart = "Нажмите R для перезапуска или Q для выхода"
         c_size = self.font_large.size(congrats)
         y_size = self.font_medium.size(your_time)
         b_size = self.font_medium.size(best_time)
+        p_size = self.font_small.size(par)
         r_size = self.font_small.size(restart)
         c_pos = ((WINDOW_WIDTH - c_size[0]) // 2, WINDOW_HEIGHT // 4)
         y_pos = ((WINDOW_WIDTH - y_size[0]) // 2, WINDOW_HEIGHT // 2 - 40)
         b_pos = ((WINDOW_WIDTH - b_size[0]) // 2, WINDOW_HEIGHT // 2 + 10)
+        p_pos = ((WINDOW_WIDTH - p_size[0]) // 2, WINDOW_HEIGHT // 2 + 60)
         r_pos = ((WINDOW_WIDTH - r_size[0]) // 2, WINDOW_HEIGHT - 80)
-        draw_text_with_shadow(self.screen, congrats, self.font_large, GREEN, c_pos)
-        draw_text_with_shadow(self.screen, your_time, self.font_medium, WHITE, y_pos)
-        draw_text_with_shadow(self.screen, best_time, self.font_medium, WHITE, b_pos)
-        draw_text_with_shadow(self.screen, restart, self.font_small, WHITE, r_pos)
+        draw_text_with_shadow(surface, congrats, self.font_large, GREEN, c_pos)
+        draw_text_with_shadow(surface, your_time, self.font_medium, WHITE, y_pos)
+        draw_text_with_shadow(surface, best_time, self.font_medium, WHITE, b_pos)
+        draw_text_with_shadow(surface, par, self.font_small, YELLOW, p_pos)
+        draw_text_with_shadow(surface, restart, self.font_small, WHITE, r_pos)
 
-    def run(self):
+    def run(self, startup_report=False):
+        if startup_report:
+            self.step()
+            self.report_startup()
         while True:
+            self.step()
+            self.clock.tick(self.fps)
+
+    def step(self):
+        # Один кадр: события, логика и вывод на экран
+        profiler = self.profiler
+        profiler.begin_frame()
+        now = time.perf_counter()
+        frame_dt = self.tick_dt if self.last_step_time is None else now - self.last_step_time
+        self.last_step_time = now
+        self.accumulator += frame_dt
+        with profiler.phase('events'):
             self.handle_events()
-            if self.state == 'SPLASH':
-                self.draw_splash()
-            elif self.state == 'MENU':
-                self.draw_menu()
-            elif self.state == 'GAME':
-                self.update_game()
+            if self.state == 'GAME' and self.playback is None:
+                self.apply_input()
+            self.poll_scores()
+        with profiler.phase('update'):
+            ticks = 0
+            while self.accumulator >= self.tick_dt and ticks < self.max_frame_skip:
+                self.update_tick()
+                self.accumulator -= self.tick_dt
+                ticks += 1
+            if self.accumulator >= self.tick_dt:
+                # Не успели: отбрасываем отставание, чтобы игра оставалась отзывчивой
+                self.accumulator %= self.tick_dt
+        self.alpha = self.accumulator / self.tick_dt
+        self.render_time = time.perf_counter()
+        if self.state == 'GAME' and self.smooth:
+            self.camera.follow(*self.sprite_pos())
+        if self.dirty_rects and not self.debug_mode:
+            self.render_dirty()
+        else:
+            with profiler.phase('render'):
+                self.render_frame()
+            self.present()
+            self.last_frame_key = None
+        if self.pending_latency:
+            # Задержка от опроса нажатия до вывода кадра с результатом хода
+            presented = time.perf_counter()
+            for stamp in self.pending_latency:
+                profiler.sample('input_latency', (presented - stamp) * 1000)
+            self.pending_latency.clear()
+        misses = self.cache_misses()
+        surfaces = surface_counter.total
+        profiler.end_frame(particles=len(self.particles), surfaces=surfaces - self.last_surfaces,
+                           cache_misses=misses - self.last_cache_misses)
+        self.last_cache_misses = misses
+        self.last_surfaces = surfaces
+
+    def present(self, rects=None):
+        with self.profiler.phase('flip'):
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+
+    def quit(self):
+        if self.recorder is not None and self.state == 'GAME':
+            self.finish_recording(self.recorder, finished=False)  # Незаконченный забег
+        self.profiler.close()
+        self.assets.shutdown()
+        if self.race is not None:
+            self.race.close()
+        if self.scores is not None:
+            self.scores.close()  # Дописывает результаты из очереди
+        pygame.quit()
+        sys.exit()
+
+    def cache_misses(self):
+        # Сколько раз с начала работы кэши поверхностей собирали содержимое заново: текст,
+        # спрайты частиц, чанки лабиринта, статичные экраны, слой тумана и спрайт призрака.
+        # Поверхности, которые создаются в кадре без кэша (строки HUD отладки), сюда не входят.
+        layer_builds = self.maze_layer.builds if self.maze_layer is not None else 0
+        fog_rebuilds = self.fog_layer.rebuilds if self.fog_layer is not None else 0
+        return (text_cache.misses + len(self.particles.sprites) + layer_builds + self.screen_builds
+                + fog_rebuilds + (self.ghost_sprite is not None))
+
+    def render_frame(self):
+        if self.state == 'SPLASH':
+            self.draw_splash()
+        elif self.state == 'MENU':
+            self.draw_menu()
+        elif self.state == 'GAME':
+            self.draw_game()
+        elif self.state == 'GAME_OVER':
+            self.draw_game_over()
+        elif self.state == 'RECORD':
+            self.draw_record()
+        elif self.state == 'ABOUT':
+            self.draw_about()
+        if self.debug_mode:
+            self.draw_debug_info()
+
+    def game_regions(self):
+        # Области кадра игры, которые могут меняться между кадрами
+        timer = text_cache.render(self.timer_text(), self.font_small, YELLOW)
+        return {
+            'player': self.player_rect(),
+            'particles': self.particles.bounds(self.camera.offset, self.alpha * self.tick_dt),
+            'timer': pygame.Rect(10, 10, timer.get_width() + 2, timer.get_height() + 2),
+            'hint': self.hint_rect(),
+            'ghost': self.ghost_rect(),
+            'light': self.light_rect(),
+            'racers': self.racers_rect(),
+        }
+
+    def render_dirty(self):
+        if self.state != 'GAME':
+            # Статичный экран выводится только при смене экрана или его содержимого
+            frame_key = (self.state, self.elapsed_time, self.best_time, self.leaderboard_page, self.leaderboard_key())
+            if frame_key != self.last_frame_key:
+                with self.profiler.phase('render'):
+                    self.render_frame()
+                self.present()
+                self.last_frame_key = frame_key
+            return
+        regions = self.game_regions()
+        # Сдвиг камеры меняет весь кадр
+        frame_key = ('GAME', self.camera.offset)
+        if self.last_frame_key != frame_key:
+            with self.profiler.phase('render'):
                 self.draw_game()
-            elif self.state == 'GAME_OVER':
-                self.draw_game_over()
-            elif self.state == 'RECORD':
-                self.draw_record()
-            elif self.state == 'ABOUT':
-                self.draw_about()
-            if self.debug_mode:
-                self.draw_debug_info()
-            pygame.display.flip()
-            self.clock.tick(FPS)
-            if self.update_count % 1000 == 0 and self.update_count != 0:
-                print("Update count:", self.update_count)
+            self.present()
+            self.last_frame_key = frame_key
+            self.last_regions = regions
+            return
+        dirty = []
+        for name, rect in regions.items():
+            old = self.last_regions.get(name)
+            # Таймер и частицы меняются почти каждый кадр (текст, прозрачность),
+            # поэтому их области грязные всегда, пока они есть на экране
+            if rect != old or name in ('timer', 'particles'):
+                dirty.extend(r for r in (old, rect) if r is not None)
+        self.last_regions = regions
+        if not dirty:
+            return
+        # Рамка подсказки со скругленными углами под частичным клипом рисуется не так,
+        # как целиком, и оставляет пиксель старой рамки: задетую подсказку перерисовываем всю
+        hint = regions.get('hint')
+        if hint is not None and any(hint.colliderect(rect) for rect in dirty):
+            dirty.append(hint)
+        dirty = merge_rects(dirty)
+        with self.profiler.phase('render'):
+            for rect in dirty:
+                self.screen.set_clip(rect)
+                self.draw_game()
+            self.screen.set_clip(None)
+        self.present(dirty)
 
-    def draw_record(self):
-        self.screen.blit(self.background_image, (0, 0))
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill(DARK_OVERLAY)
-        self.screen.blit(overlay, (0, 0))
-        title = "Рекорд"
-        t_size = self.font_large.size(title)
-        t_pos = ((WINDOW_WIDTH - t_size[0]) // 2, WINDOW_HEIGHT // 4)
-        draw_text_with_shadow(self.screen, title, self.font_large, WHITE, t_pos)
-        rec = "Лучшее время: " + (f"{self.best_time:.2f} сек" if self.best_time is not None else "нет")
-        r_size = self.font_medium.size(rec)
-        r_pos = ((WINDOW_WIDTH - r_size[0]) // 2, WINDOW_HEIGHT // 2)
-        draw_text_with_shadow(self.screen, rec, self.font_medium, YELLOW, r_pos)
-        info = "Нажмите любую клавишу для возврата в меню."
-        i_size = self.font_small.size(info)
-        i_pos = ((WINDOW_WIDTH - i_size[0]) // 2, WINDOW_HEIGHT - 80)
-        draw_text_with_shadow(self.screen, info, self.font_small, RED, i_pos)
+    def sprite_pos(self):
+        # Позиция спрайта игрока в клетках: плавный переезд из move_from в текущую клетку.
+        # Кадр попадет на экран примерно через кадр, поэтому прогресс берется на этот момент.
+        if not self.smooth or self.move_from is None:
+            return self.player_pos
+        frame_time = 1.0 / self.fps if self.fps else self.tick_dt
+        progress = (self.render_time - self.move_time + frame_time) / self.move_duration
+        if progress >= 1.0:
+            self.move_from = None
+            return self.player_pos
+        progress = max(0.0, progress)
+        (from_row, from_col), (row, col) = self.move_from, self.player_pos
+        return from_row + (row - from_row) * progress, from_col + (col - from_col) * progress
 
-    def draw_about(self):
-        self.screen.blit(self.background_image, (0, 0))
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill(DARK_OVERLAY)
-        self.screen.blit(overlay, (0, 0))
-        title = "Об игре"
-        about_lines = [
-            "Это простая игра-лабиринт, разработанная с использованием PyGame.",
-            "Пробегите лабиринт как можно быстрее.",
-            "Попробуйте побить свой личный рекорд!",
-            "Наслаждайтесь игрой и весёлитесь!"
-        ]
-        t_size = self.font_large.size(title)
-        draw_text_with_shadow(self.screen, title, self.font_large, WHITE, ((WINDOW_WIDTH-t_size[0])//2, 80))
-        for idx, line in enumerate(about_lines):
-            l_size = self.font_small.size(line)
-            l_pos = ((WINDOW_WIDTH-l_size[0])//2, 150 + idx*40)
-            draw_text_with_shadow(self.screen, line, self.font_small, YELLOW, l_pos)
-        info = "Нажмите любую клавишу для возврата в меню."
-        i_size = self.font_small.size(info)
-        i_pos = ((WINDOW_WIDTH-i_size[0])//2, WINDOW_HEIGHT-80)
-        draw_text_with_shadow(self.screen, info, self.font_small, RED, i_pos)
+    def player_rect(self):
+        row, col = self.sprite_pos()
+        off_x, off_y = self.camera.offset
+        return pygame.Rect(round(off_x + col * TILE_SIZE), round(off_y + row * TILE_SIZE), TILE_SIZE, TILE_SIZE)
 
-    def draw_particles(self, surface):
-        for p in self.particles:
-            p.draw(surface)
+    def hint_rect(self):
+        cell = self.hint_cell() if self.show_hint else None
+        return self.camera.tile_rect(*cell) if cell is not None else None
 
-    def update_particles(self, dt):
-        for p in self.particles:
-            p.update(dt)
-        self.particles = [p for p in self.particles if p.lifetime > 0]
+    def draw_hint(self):
+        rect = self.hint_rect()
+        if rect is not None:
+            pygame.draw.rect(self.screen, YELLOW, rect.inflate(-8, -8), 3, border_radius=6)
+
+    def light_rect(self):
+        # Область, где туман меняется при ходе игрока
+        if self.visibility is None:
+            return None
+        margin = (self.fog_radius + 1) * TILE_SIZE
+        return self.camera.tile_rect(*self.player_pos).inflate(2 * margin, 2 * margin)
+
+    def ghost_rect(self):
+        return self.camera.tile_rect(*self.ghost_pos) if self.ghost_pos is not None else None
+
+    def draw_ghost(self):
+        rect = self.ghost_rect()
+        if rect is None:
+            return
+        if self.ghost_sprite is None:
+            self.ghost_sprite = surface_counter.add(self.player_image.copy())
+            self.ghost_sprite.set_alpha(GHOST_ALPHA)
+        self.screen.blit(self.ghost_sprite, rect)
+
+    def racer_rects(self):
+        # Соперники в тумане видны, только когда их клетка освещена
+        if self.race is None:
+            return []
+        rects = []
+        for player_id, racer in self.race.others.items():
+            if self.visibility is not None and not self.visibility.is_visible(*racer.pos):
+                continue
+            rects.append((player_id, racer, self.camera.tile_rect(*racer.pos)))
+        return rects
+
+    def racers_rect(self):
+        rects = [rect for _, _, rect in self.racer_rects()]
+        return rects[0].unionall(rects[1:]) if rects else None
+
+    def draw_racers(self):
+        for player_id, racer, rect in self.racer_rects():
+            color = RACER_COLORS[player_id % len(RACER_COLORS)]
+            pygame.draw.circle(self.screen, color, rect.center, TILE_SIZE // 3)
+            if racer.finish_ticks is not None:
+                pygame.draw.circle(self.screen, YELLOW, rect.center, TILE_SIZE // 3, 3)
+
+    def timer_text(self):
+        return f"Время: {self.elapsed_time:.2f} сек"
 
     def draw_game(self):
         self.screen.blit(self.background_image, (0, 0))
-        self.draw_maze()
-        maze_width = len(MAZE_LAYOUT[0]) * TILE_SIZE
-        maze_height = len(MAZE_LAYOUT) * TILE_SIZE
-        maze_x = (WINDOW_WIDTH - maze_width) // 2
-        maze_y = (WINDOW_HEIGHT - maze_height) // 2
-        self.screen.blit(self.maze_surface, (maze_x, maze_y))
-        p_x = maze_x + self.player_pos[1] * TILE_SIZE
-        p_y = maze_y + self.player_pos[0] * TILE_SIZE
-        self.screen.blit(self.player_image, pygame.Rect(p_x, p_y, TILE_SIZE, TILE_SIZE))
-        timer = f"Время: {self.elapsed_time:.2f} сек"
-        draw_text_with_shadow(self.screen, timer, self.font_small, YELLOW, (10, 10))
-        self.draw_particles(self.screen)
+        with self.profiler.phase('maze_draw'):
+            self.draw_maze()
+        self.draw_hint()
+        self.draw_ghost()
+        if self.fog_layer is not None:
+            with self.profiler.phase('fog_draw'):
+                self.fog_layer.draw(self.screen, self.camera)
+        self.draw_racers()
+        self.screen.blit(self.player_image, self.player_rect())
+        draw_text_with_shadow(self.screen, self.timer_text(), self.font_small, YELLOW, (10, 10))
+        with self.profiler.phase('particles_draw'):
+            self.draw_particles(self.screen)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Лабиринт")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="перерисовывать и выводить только изменившиеся области экрана")
+    parser.add_argument("--size", type=parse_size, metavar="ROWSxCOLS",
+                        help="сгенерировать лабиринт заданного размера вместо встроенного")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default='backtracker',
+                        help="алгоритм генерации лабиринта")
+    parser.add_argument("--seed", type=int, help="зерно генератора лабиринта")
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE, help="шагов логики в секунду")
+    parser.add_argument("--fps", type=int, default=FPS, help="ограничение частоты кадров, 0 - без ограничения")
+    parser.add_argument("--vsync", action="store_true", help="синхронизировать вывод с обновлением экрана")
+    parser.add_argument("--max-frame-skip", type=int, default=MAX_FRAME_SKIP,
+                        help="максимум шагов логики за один кадр")
+    parser.add_argument("--trace", metavar="PATH", help="записать трассу фаз кадра (Chrome Trace Event JSON)")
+    parser.add_argument("--cprofile", metavar="PATH", help="записать статистику cProfile при выходе")
+    parser.add_argument("--no-asset-cache", action="store_true",
+                        help="не использовать дисковый кэш подготовленных изображений и путей к шрифтам")
+    parser.add_argument("--no-audio", action="store_true", help="не инициализировать звук")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="вывести время этапов запуска и первого кадра")
+    parser.add_argument("--record", metavar="DIR", help="сохранять запись каждого забега в каталог")
+    parser.add_argument("--replay", metavar="PATH", help="воспроизвести запись забега")
+    parser.add_argument("--headless", action="store_true",
+                        help="с --replay: прогнать запись без окна на максимальной скорости и вывести время")
+    parser.add_argument("--no-ghost", action="store_true", help="не показывать призрак лучшего забега")
+    parser.add_argument("--player", help="имя игрока в таблице рекордов (по умолчанию - имя пользователя)")
+    parser.add_argument("--scores", default=SCORES_DB, metavar="PATH", help="файл базы результатов SQLite")
+    parser.add_argument("--repeat-delay", type=int, default=REPEAT_DELAY_MS, metavar="MS",
+                        help="задержка перед повтором хода при удержании стрелки")
+    parser.add_argument("--repeat-interval", type=int, default=REPEAT_INTERVAL_MS, metavar="MS",
+                        help="период повтора хода при удержании стрелки")
+    parser.add_argument("--no-smooth", action="store_true", help="без плавного перемещения спрайта между клетками")
+    parser.add_argument("--fog", action="store_true", help="туман войны: виден только круг света вокруг игрока")
+    parser.add_argument("--fog-radius", type=int, default=FOG_RADIUS, help="радиус света в клетках")
+    parser.add_argument("--race", metavar="HOST[:PORT]",
+                        help="гонка на сервере race_server.py; лабиринт задает сервер")
+    parser.add_argument("--room", default="lobby", help="комната на сервере гонок")
+    return parser.parse_args(argv)
+
+def maze_from_args(args):
+    if not args.size:
+        return None
+    return generate(*args.size, args.algorithm, args.seed)
 
 if __name__ == '__main__':
-    game = MazeGame()
-    game.run()
+    args = parse_args()
+    replay = None
+    if args.replay:
+        # Запись читается до создания игры: от нее зависит частота логики
+        try:
+            replay = Replay.load(args.replay)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Невозможно воспроизвести запись: {e}")
+    if replay is not None:
+        args.tick_rate = replay.tick_rate  # Запись воспроизводится с той же частотой логики
+        if args.headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    race = None
+    if args.race:
+        host, _, port = args.race.partition(':')
+        try:
+            race = RaceClient(host, int(port) if port else RACE_PORT, args.room,
+                              args.player or default_player_name())
+        except OSError as e:
+            sys.exit(f"Не удалось подключиться к серверу гонок: {e}")
+        args.tick_rate = race.tick_rate  # Не больше одного хода за шаг сервера, как и в игре
+    game = MazeGame(dirty_rects=args.dirty_rects, maze=race.maze if race else maze_from_args(args),
+                    tick_rate=args.tick_rate,
+                    fps=args.fps, vsync=args.vsync, max_frame_skip=args.max_frame_skip,
+                    asset_cache=not args.no_asset_cache, audio=not args.no_audio and not args.headless,
+                    record_dir=args.record, ghost=not args.no_ghost, scores_path=args.scores,
+                    player=args.player, repeat_delay=args.repeat_delay, repeat_interval=args.repeat_interval,
+                    smooth=not args.no_smooth, fog=args.fog, fog_radius=args.fog_radius, race=race)
+    if replay is not None:
+        try:
+            if args.headless:
+                elapsed = game.replay_headless(replay)
+                print("Время забега:", f"{elapsed:.2f} сек" if elapsed is not None else "выход не достигнут")
+                game.quit()
+            game.start_replay(replay)
+        except ValueError as e:
+            print("Невозможно воспроизвести запись:", e)
+            game.quit()
+    if args.trace:
+        game.profiler.start_trace(args.trace)
+    if args.cprofile:
+        game.profiler.start_cprofile(args.cprofile)
+    game.run(startup_report=args.startup_report)
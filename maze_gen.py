@@ -0,0 +1,199 @@
+# Генератор лабиринтов. Как и maze_core, не зависит от pygame.
+# Лабиринт строится на сетке комнат: комната (r, c) занимает клетку (2r+1, 2c+1),
+# а стены между комнатами - клетки между ними. Все алгоритмы итеративные (без рекурсии),
+# работают с плоскими индексами и bytearray и масштабируются до сеток 2000x2000 и больше.
+import argparse
+import random
+from array import array
+
+from maze_core import Maze, FLOOR, WALL
+
+ALGORITHMS = ('backtracker', 'kruskal', 'wilson')
+
+
+def room_grid(rows, cols):
+    # Размеры сетки комнат для лабиринта rows x cols клеток
+    if rows < 3 or cols < 3:
+        raise ValueError("Лабиринт должен быть не меньше 3x3 клеток")
+    return (rows - 1) // 2, (cols - 1) // 2
+
+
+def parse_size(text):
+    # Размер "ROWSxCOLS" из командной строки; подходит как type= для argparse
+    try:
+        rows, cols = (int(x) for x in text.lower().split('x'))
+        room_grid(rows, cols)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"размер должен быть вида ROWSxCOLS, не меньше 3x3: {text!r}") from e
+    return rows, cols
+
+
+def generate(rows, cols, algorithm='backtracker', seed=None):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Неизвестный алгоритм: {algorithm} (доступны: {', '.join(ALGORITHMS)})")
+    room_rows, room_cols = room_grid(rows, cols)
+    rng = random.Random(seed)
+    cells = bytearray([WALL]) * (rows * cols)
+    carve = Carver(cells, cols, room_cols)
+    if algorithm == 'backtracker':
+        carve_backtracker(carve, room_rows, room_cols, rng)
+    elif algorithm == 'kruskal':
+        carve_kruskal(carve, room_rows, room_cols, rng)
+    else:
+        carve_wilson(carve, room_rows, room_cols, rng)
+    start = (1, 1)
+    exit = (2 * room_rows - 1, 2 * room_cols - 1)
+    return Maze(cells, rows, cols, start, exit)
+
+
+class Carver:
+    # Переводит номера комнат в индексы клеток и прорубает проходы
+    def __init__(self, cells, cols, room_cols):
+        self.cells = cells
+        self.cols = cols
+        self.room_cols = room_cols
+
+    def cell(self, room):
+        r, c = divmod(room, self.room_cols)
+        return (2 * r + 1) * self.cols + 2 * c + 1
+
+    def open_room(self, room):
+        self.cells[self.cell(room)] = FLOOR
+
+    def connect(self, a, b):
+        # Комнаты соседние, поэтому стена между ними - середина отрезка между клетками
+        ca, cb = self.cell(a), self.cell(b)
+        self.cells[ca] = FLOOR
+        self.cells[cb] = FLOOR
+        self.cells[(ca + cb) // 2] = FLOOR
+
+
+def neighbours(room, room_rows, room_cols):
+    r, c = divmod(room, room_cols)
+    if r > 0:
+        yield room - room_cols
+    if r < room_rows - 1:
+        yield room + room_cols
+    if c > 0:
+        yield room - 1
+    if c < room_cols - 1:
+        yield room + 1
+
+
+def carve_backtracker(carve, room_rows, room_cols, rng):
+    # Поиск в глубину с возвратом на явном стеке
+    visited = bytearray(room_rows * room_cols)
+    visited[0] = 1
+    carve.open_room(0)
+    stack = [0]
+    while stack:
+        room = stack[-1]
+        options = [n for n in neighbours(room, room_rows, room_cols) if not visited[n]]
+        if not options:
+            stack.pop()
+            continue
+        nxt = options[rng.randrange(len(options))] if len(options) > 1 else options[0]
+        visited[nxt] = 1
+        carve.connect(room, nxt)
+        stack.append(nxt)
+
+
+def carve_kruskal(carve, room_rows, room_cols, rng):
+    # Случайный порядок всех стен + система непересекающихся множеств
+    size = room_rows * room_cols
+    parent = array('i', range(size))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    # Стена кодируется как room * 2 + (0 - вправо, 1 - вниз)
+    edges = array('i', (room * 2 + d for room in range(size) for d in (0, 1)
+                        if (d == 0 and room % room_cols < room_cols - 1) or (d == 1 and room < size - room_cols)))
+    rng.shuffle(edges)
+    if size == 1:
+        carve.open_room(0)
+    joined = 1
+    for edge in edges:
+        room, d = edge >> 1, edge & 1
+        other = room + 1 if d == 0 else room + room_cols
+        a, b = find(room), find(other)
+        if a == b:
+            continue
+        parent[a] = b
+        carve.connect(room, other)
+        joined += 1
+        if joined == size:
+            break
+
+
+def carve_wilson(carve, room_rows, room_cols, rng):
+    # Алгоритм Уилсона: случайные блуждания со стиранием петель дают равномерное остовное дерево.
+    # Петли стираются неявно: для каждой комнаты запоминается только последний выход из нее.
+    size = room_rows * room_cols
+    in_tree = bytearray(size)
+    next_room = array('i', [0]) * size
+    root = rng.randrange(size)
+    in_tree[root] = 1
+    carve.open_room(root)
+    remaining = size - 1
+    last_row = size - room_cols
+    rand = rng.random
+    for start in range(size):
+        if remaining == 0:
+            break
+        if in_tree[start]:
+            continue
+        room = start
+        while not in_tree[room]:
+            # Случайное направление; шаги за границу сетки просто отбрасываются
+            d = int(rand() * 4)
+            if d == 0:
+                if room < room_cols:
+                    continue
+                nxt = room - room_cols
+            elif d == 1:
+                if room >= last_row:
+                    continue
+                nxt = room + room_cols
+            elif d == 2:
+                if room % room_cols == 0:
+                    continue
+                nxt = room - 1
+            else:
+                if room % room_cols == room_cols - 1:
+                    continue
+                nxt = room + 1
+            next_room[room] = nxt
+            room = nxt
+        room = start
+        while not in_tree[room]:
+            in_tree[room] = 1
+            remaining -= 1
+            carve.connect(room, next_room[room])
+            room = next_room[room]
+
+
+def is_solvable(maze):
+    # Заливка от старта по плоскому буферу клеток; выход за границы невозможен,
+    # пока край лабиринта - стена, но проверки границ оставлены для произвольных карт
+    cells, rows, cols = maze.cells, maze.rows, maze.cols
+    start = maze.start[0] * cols + maze.start[1]
+    target = maze.exit[0] * cols + maze.exit[1]
+    if cells[start] == WALL or cells[target] == WALL:
+        return False
+    seen = bytearray(rows * cols)
+    seen[start] = 1
+    stack = [start]
+    while stack:
+        pos = stack.pop()
+        if pos == target:
+            return True
+        col = pos % cols
+        for nxt in (pos - cols, pos + cols, pos - 1 if col > 0 else -1, pos + 1 if col < cols - 1 else -1):
+            if 0 <= nxt < rows * cols and not seen[nxt] and cells[nxt] != WALL:
+                seen[nxt] = 1
+                stack.append(nxt)
+    return False
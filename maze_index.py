@@ -0,0 +1,143 @@
+# Индекс лабиринта: все, что зависит только от структуры лабиринта, считается один раз
+# при загрузке, а во время игры доступно за O(1).
+#   - карта тупиков и степень каждой клетки (векторно через NumPy);
+#   - поле расстояний до выхода (BFS по уровням на плоских индексах, широкий фронт - NumPy);
+#   - разбиение на развилки и коридоры (компоненты связности массивами NumPy);
+#   - длина кратчайшего пути от старта до выхода.
+# Как и maze_core, модуль не зависит от pygame.
+from array import array
+
+import numpy as np
+
+from maze_core import DIRECTIONS, FLOOR
+
+UNREACHABLE = -1
+WIDE_FRONTIER = 32  # С какого размера фронт BFS раскрывается через NumPy
+
+
+class MazeIndex:
+    def __init__(self, maze):
+        self.maze = maze
+        rows, cols = maze.rows, maze.cols
+        self.cols = cols
+        grid = np.frombuffer(bytes(maze.cells), dtype=np.uint8).reshape(rows, cols)
+        passable = grid == FLOOR
+
+        # Число открытых соседей у каждой клетки: сдвиги массива вместо цикла по клеткам
+        padded = np.pad(passable, 1).astype(np.uint8)
+        degree = padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+        degree[~passable] = 0
+        self.passable = bytearray(passable.tobytes())
+        self.walls = bytes(np.logical_not(passable).tobytes())
+        self.degree = bytearray(degree.astype(np.uint8).tobytes())
+        self.dead_ends = bytearray((passable & (degree <= 1)).tobytes())
+        self.junctions = bytearray((passable & (degree >= 3)).tobytes())
+
+        self.distance = self.distances_from(maze.exit)
+        self.optimal_length = self.distance_to_exit(*maze.start)
+        self.segments, self.segment_count = self.label_corridors()
+
+    def distances_from(self, target):
+        # BFS по уровням на плоских индексах лабиринта, обрамленного рамкой стен: у каждой
+        # клетки четыре соседа pos±1 и pos±width без проверок края. Широкий фронт
+        # раскрывается массивами NumPy (соседи всего фронта, маска по seen, присвоение
+        # уровня); узкий - циклом Python: в длинных коридорах фронт из пары клеток, а
+        # накладные расходы вызовов NumPy на уровень больше, чем весь цикл по нему.
+        rows, cols = self.maze.rows, self.maze.cols
+        width = cols + 2
+        walls = np.frombuffer(self.walls, dtype=np.bool_).reshape(rows, cols)
+        blocked = np.pad(walls, 1, constant_values=True)
+        seen = bytearray(blocked.tobytes())
+        distance = array('i', [UNREACHABLE]) * len(seen)
+        seen_view = np.frombuffer(seen, dtype=np.bool_)
+        distance_view = np.frombuffer(distance, dtype=np.int32)
+        origin = (target[0] + 1) * width + target[1] + 1
+        if not seen[origin]:
+            seen[origin] = 1
+            distance[origin] = 0
+            offsets = np.array((-width, width, -1, 1), dtype=np.intp)
+            frontier = [origin]
+            level = 0
+            while len(frontier):
+                level += 1
+                if len(frontier) >= WIDE_FRONTIER:
+                    nxt = (np.asarray(frontier, dtype=np.intp)[:, None] + offsets).ravel()
+                    nxt = np.unique(nxt[~seen_view[nxt]])
+                    seen_view[nxt] = True
+                    distance_view[nxt] = level
+                    frontier = nxt if len(nxt) >= WIDE_FRONTIER else nxt.tolist()
+                    continue
+                nxt = []
+                append = nxt.append
+                for pos in frontier:
+                    for n in (pos - width, pos + width, pos - 1, pos + 1):
+                        if not seen[n]:
+                            seen[n] = 1
+                            distance[n] = level
+                            append(n)
+                frontier = nxt
+        inner = distance_view.reshape(rows + 2, width)[1:-1, 1:-1]
+        return array('i', inner.tobytes())
+
+    def label_corridors(self):
+        # Коридор - связная группа проходимых клеток, у которых не больше двух соседей.
+        # Развилки (3-4 соседа) в коридоры не входят и имеют метку UNREACHABLE.
+        # Компоненты связности ищутся массивами: каждая клетка начинает со своей метки
+        # (плоского индекса), по ребрам между соседними клетками коридоров большая метка
+        # заменяется меньшей, а скачки по указателям labels[labels] сжимают цепочки.
+        # Итераций - O(log n), а не по одной на клетку самого длинного коридора.
+        rows, cols = self.maze.rows, self.maze.cols
+        size = rows * cols
+        corridor = np.frombuffer(self.passable, dtype=np.bool_) & ~np.frombuffer(self.junctions, dtype=np.bool_)
+        cells = np.arange(size)
+        right = np.flatnonzero(corridor[:-1] & corridor[1:] & (cells[:-1] % cols != cols - 1))
+        down = np.flatnonzero(corridor[:-cols] & corridor[cols:])
+        a = np.concatenate((right, down))
+        b = np.concatenate((right + 1, down + cols))
+        labels = cells
+        while True:
+            label_a, label_b = labels[a], labels[b]
+            differ = label_a != label_b
+            if not differ.any():
+                break
+            a, b, label_a, label_b = a[differ], b[differ], label_a[differ], label_b[differ]
+            np.minimum.at(labels, np.maximum(label_a, label_b), np.minimum(label_a, label_b))
+            while True:
+                jumped = labels[labels]
+                if np.array_equal(jumped, labels):
+                    break
+                labels = jumped
+        # Метка компоненты - ее первая клетка, поэтому номера коридоров идут в порядке обхода строк
+        roots, numbers = np.unique(labels[corridor], return_inverse=True)
+        segments = np.full(size, UNREACHABLE, dtype=np.int32)
+        segments[corridor] = numbers
+        return array('i', segments.tobytes()), len(roots)
+
+    def is_dead_end(self, row, col):
+        return self.dead_ends[row * self.cols + col] == 1
+
+    def is_junction(self, row, col):
+        return self.junctions[row * self.cols + col] == 1
+
+    def distance_to_exit(self, row, col):
+        return self.distance[row * self.cols + col]
+
+    def segment_of(self, row, col):
+        return self.segments[row * self.cols + col]
+
+    def next_step(self, row, col):
+        # Код направления, ведущего к выходу по кратчайшему пути, или None
+        here = self.distance_to_exit(row, col)
+        if here <= 0:
+            return None
+        for code, (dr, dc) in enumerate(DIRECTIONS):
+            r, c = row + dr, col + dc
+            if self.maze.in_bounds(r, c) and self.distance_to_exit(r, c) == here - 1:
+                return code
+        return None
+
+    def optimality_gap(self, moves):
+        # Во сколько раз (минус один) пройденный путь длиннее оптимального
+        if self.optimal_length <= 0:
+            return 0.0
+        return moves / self.optimal_length - 1.0
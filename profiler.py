@@ -0,0 +1,165 @@
+# Покадровый профилировщик: замеры фаз кадра, история времени кадра и счетчики.
+# Не зависит от pygame; используется HUD-ом отладки в игре, бенчмарками и может
+# подключаться из любого кода. Дополнительно умеет писать трассу в формате
+# Chrome Trace Event (открывается в chrome://tracing или Perfetto) и статистику cProfile.
+import cProfile
+import json
+import os
+import time
+from collections import deque
+
+HISTORY_FRAMES = 240        # Сколько последних кадров хранить для графиков и средних
+MAX_TRACE_EVENTS = 500000   # Ограничение на размер трассы в памяти
+
+
+class AllocationCounter:
+    # Сквозной счетчик созданных объектов: место создания передает объект через add,
+    # а прирост за кадр дает число созданий в этом кадре
+    __slots__ = ('total',)
+
+    def __init__(self):
+        self.total = 0
+
+    def add(self, obj):
+        self.total += 1
+        return obj
+
+
+# Поверхности pygame: считаются во всех местах их создания в игре и загрузчике ресурсов
+surfaces = AllocationCounter()
+
+
+class Phase:
+    # Контекстный менеджер одной фазы; класс вместо генератора ради меньших накладных расходов
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY_FRAMES):
+        self.history = history
+        self.phases = {}        # имя фазы -> deque длительностей (мс) по кадрам
+        self.counters = {}      # имя счетчика -> deque значений по кадрам
+        self.samples = {}       # имя -> deque отдельных замеров, не привязанных к кадрам (например, задержка ввода)
+        self.frame_times = deque(maxlen=history)  # полное время кадра (мс), включая ожидание
+        self.work_times = deque(maxlen=history)   # время от начала до конца кадра (мс)
+        self.current = {}
+        self.frame_start = None
+        self.last_frame_start = None
+        self.trace = None
+        self.trace_path = None
+        self.cprofile = None
+        self.cprofile_path = None
+        self.origin = time.perf_counter()
+
+    def reset(self):
+        self.phases.clear()
+        self.counters.clear()
+        self.samples.clear()
+        self.frame_times.clear()
+        self.work_times.clear()
+        self.current = {}
+        self.last_frame_start = None
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def add(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + (end - start) * 1000
+        if self.trace is not None:
+            self.trace.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                               'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6})
+
+    def sample(self, name, value):
+        self.samples.setdefault(name, deque(maxlen=self.history)).append(value)
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.last_frame_start is not None:
+            self.frame_times.append((now - self.last_frame_start) * 1000)
+        self.last_frame_start = now
+        self.frame_start = now
+        self.current = {}
+
+    def end_frame(self, **counters):
+        now = time.perf_counter()
+        if self.frame_start is None:
+            return
+        self.work_times.append((now - self.frame_start) * 1000)
+        for name, value in self.current.items():
+            self.phases.setdefault(name, deque(maxlen=self.history)).append(value)
+        # Фазы, которых не было в этом кадре, получают ноль, чтобы истории шли синхронно
+        for name, values in self.phases.items():
+            if name not in self.current:
+                values.append(0.0)
+        for name, value in counters.items():
+            self.counters.setdefault(name, deque(maxlen=self.history)).append(value)
+        if self.trace is not None:
+            self.add('frame', self.frame_start, now)
+        self.frame_start = None
+
+    # --- Сводка ---
+
+    @staticmethod
+    def average(values):
+        return sum(values) / len(values) if values else 0.0
+
+    def phase_means(self):
+        return {name: self.average(values) for name, values in self.phases.items()}
+
+    def last(self, name, default=0):
+        values = self.counters.get(name)
+        return values[-1] if values else default
+
+    def counter_mean(self, name):
+        return self.average(self.counters.get(name, ()))
+
+    def sample_stats(self, name):
+        # Среднее и максимум замеров; (0, 0), если замеров не было
+        values = self.samples.get(name)
+        return (self.average(values), max(values)) if values else (0.0, 0.0)
+
+    def fps(self):
+        mean = self.average(self.frame_times)
+        return 1000.0 / mean if mean > 0 else 0.0
+
+    # --- Экспорт ---
+
+    def start_trace(self, path):
+        self.trace = deque(maxlen=MAX_TRACE_EVENTS)
+        self.trace_path = path
+
+    def save_trace(self, path=None):
+        path = path or self.trace_path
+        if self.trace is None or path is None:
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': list(self.trace), 'displayTimeUnit': 'ms'}, f)
+
+    def start_cprofile(self, path):
+        self.cprofile = cProfile.Profile()
+        self.cprofile_path = path
+        self.cprofile.enable()
+
+    def stop_cprofile(self, path=None):
+        if self.cprofile is None:
+            return
+        self.cprofile.disable()
+        self.cprofile.dump_stats(path or self.cprofile_path)
+        self.cprofile = None
+
+    def close(self):
+        # Сохраняет включенные трассу и cProfile; вызывается при выходе из игры
+        self.save_trace()
+        self.stop_cprofile()
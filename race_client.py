@@ -0,0 +1,186 @@
+# Протокол гонок по лабиринту и клиент для игры. Сервер - race_server.py; этот модуль
+# не зависит от asyncio и pygame, поэтому игра импортирует его без заметной задержки запуска.
+# После подключения сокет клиента неблокирующий, и poll() забирает все, что пришло,
+# не останавливая кадр.
+#
+# Протокол поверх TCP, все числа little-endian. Кадр: длина тела (u32), тип (u8), тело.
+#   клиент -> сервер:
+#     HELLO  комната и имя игрока (u8 длина + UTF-8 каждое)
+#     MOVE   код хода (u8); сервер применяет не больше одного хода игрока за шаг
+#     RESET  начать забег заново
+#   сервер -> клиент:
+#     WELCOME  id игрока (u16), частота шагов (u16), строки, столбцы, старт, выход (u32),
+#              клетки лабиринта, сжатые zlib
+#     UPDATE   шаг сервера (u32), число записей (u16) и записи «id (u16), вид (u8), данные»:
+#              вид 0-3 - ход с этим кодом (дельта позиции), JOIN - позиция (u16, u16) и имя,
+#              LEAVE, FINISH - время забега в шагах (u32), RESET - возврат на старт
+import socket
+import struct
+import zlib
+
+from maze_core import DIRECTIONS, Maze
+
+DEFAULT_PORT = 5555
+CONNECT_TIMEOUT = 5.0
+MAX_FRAME = 1024           # Наибольшее тело кадра от клиента (HELLO с двумя строками по 255 байт)
+
+FRAME = struct.Struct('<IB')
+HELLO, MOVE, RESET = 1, 2, 3   # клиент -> сервер
+WELCOME, UPDATE = 1, 2         # сервер -> клиент
+WELCOME_HEADER = struct.Struct('<HHIIIIII')
+UPDATE_HEADER = struct.Struct('<IH')
+ENTRY = struct.Struct('<HB')
+POSITION = struct.Struct('<HH')
+TICKS = struct.Struct('<I')
+
+# Виды записей UPDATE после кодов ходов 0-3
+JOIN, LEAVE, FINISH, RESET_ENTRY = 4, 5, 6, 7
+
+
+def frame(kind, body=b''):
+    return FRAME.pack(len(body), kind) + body
+
+
+def pack_text(text):
+    data = text.encode('utf-8')[:255]
+    return bytes((len(data),)) + data
+
+
+def unpack_text(data, offset):
+    size = data[offset]
+    return data[offset + 1:offset + 1 + size].decode('utf-8', 'replace'), offset + 1 + size
+
+
+# --- Клиент ---
+
+class RemotePlayer:
+    def __init__(self, name, pos):
+        self.name = name
+        self.pos = pos
+        self.finish_ticks = None
+
+
+class RaceClient:
+    def __init__(self, host, port, room, player):
+        self.sock = socket.create_connection((host, port), timeout=CONNECT_TIMEOUT)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(frame(HELLO, pack_text(room) + pack_text(player)))
+        self.buffer = bytearray()
+        self.outgoing = bytearray()
+        self.others = {}  # id -> RemotePlayer
+        self.server_tick = 0
+        self.connected = True
+        kind, body = self.read_blocking()
+        if kind != WELCOME:
+            raise ConnectionError("Сервер не прислал приветствие")
+        player_id, tick_rate, rows, cols, start_row, start_col, exit_row, exit_col = WELCOME_HEADER.unpack_from(body)
+        cells = bytearray(zlib.decompress(body[WELCOME_HEADER.size:]))
+        self.player_id = player_id
+        self.tick_rate = tick_rate
+        self.maze = Maze(cells, rows, cols, (start_row, start_col), (exit_row, exit_col))
+        self.sock.setblocking(False)
+
+    def read_blocking(self):
+        while True:
+            message = self.next_frame()
+            if message is not None:
+                return message
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Сервер закрыл соединение")
+            self.buffer += data
+
+    def next_frame(self):
+        if len(self.buffer) < FRAME.size:
+            return None
+        size, kind = FRAME.unpack_from(self.buffer)
+        end = FRAME.size + size
+        if len(self.buffer) < end:
+            return None
+        body = bytes(self.buffer[FRAME.size:end])
+        del self.buffer[:end]
+        return kind, body
+
+    def send_move(self, code):
+        self.outgoing += frame(MOVE, bytes((code,)))
+        self.flush()
+
+    def send_reset(self):
+        self.outgoing += frame(RESET)
+        self.flush()
+
+    def flush(self):
+        if not self.connected or not self.outgoing:
+            return
+        try:
+            sent = self.sock.send(self.outgoing)
+            del self.outgoing[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.disconnect()
+
+    def disconnect(self):
+        # Без связи с сервером соперники не показываются: их позиции больше не обновляются
+        self.connected = False
+        self.others.clear()
+
+    def poll(self):
+        # Читает все доступные данные и применяет обновления; True, если что-то изменилось
+        if not self.connected:
+            return False
+        self.flush()
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                self.disconnect()
+                break
+            if not data:
+                self.disconnect()
+                break
+            self.buffer += data
+        changed = False
+        while True:
+            message = self.next_frame()
+            if message is None:
+                break
+            kind, body = message
+            if kind == UPDATE:
+                self.apply_update(body)
+                changed = True
+        return changed
+
+    def apply_update(self, body):
+        self.server_tick, count = UPDATE_HEADER.unpack_from(body)
+        offset = UPDATE_HEADER.size
+        for _ in range(count):
+            player_id, kind = ENTRY.unpack_from(body, offset)
+            offset += ENTRY.size
+            other = self.others.get(player_id)
+            if kind < len(DIRECTIONS):
+                if other is not None:
+                    d_row, d_col = DIRECTIONS[kind]
+                    other.pos = (other.pos[0] + d_row, other.pos[1] + d_col)
+            elif kind == JOIN:
+                pos = POSITION.unpack_from(body, offset)
+                name, offset = unpack_text(body, offset + POSITION.size)
+                if player_id != self.player_id:
+                    self.others[player_id] = RemotePlayer(name, pos)
+            elif kind == LEAVE:
+                self.others.pop(player_id, None)
+            elif kind == FINISH:
+                (ticks,) = TICKS.unpack_from(body, offset)
+                offset += TICKS.size
+                if other is not None:
+                    other.finish_ticks = ticks
+            elif kind == RESET_ENTRY:
+                if other is not None:
+                    other.pos = self.maze.start
+                    other.finish_ticks = None
+
+    def close(self):
+        self.connected = False
+        self.sock.close()
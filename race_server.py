@@ -0,0 +1,227 @@
+# Сервер гонок: несколько игроков проходят один лабиринт наперегонки. Сервер на asyncio
+# ведет логику всех комнат сам (GameCore на каждого игрока, без pygame), клиенты только
+# присылают ходы. Изменения за шаг сервера собираются в одно сообщение на комнату и
+# рассылаются раз в шаг, а не на каждый ход. Протокол и клиент - в race_client.py.
+#
+#   python race_server.py --port 5555 --size 101x101
+#   python maze_game.py --race 127.0.0.1:5555 --room lobby --player Аня
+import argparse
+import asyncio
+import socket
+import struct
+import time
+import zlib
+from collections import deque
+
+from maze_core import MAZE_LAYOUT, START_POS, EXIT_POS, DIRECTIONS, Maze, GameCore
+from maze_gen import ALGORITHMS, generate, parse_size
+from maze_index import MazeIndex
+from race_client import (DEFAULT_PORT, MAX_FRAME, FRAME, HELLO, MOVE, RESET, WELCOME, UPDATE, WELCOME_HEADER,
+                         UPDATE_HEADER, ENTRY, POSITION, TICKS, JOIN, LEAVE, FINISH, RESET_ENTRY, frame, pack_text,
+                         unpack_text)
+
+TICK_RATE = 60
+MAX_PENDING_MOVES = 32     # Ходы сверх этого числа в очереди отбрасываются
+MAX_WRITE_BUFFER = 1 << 20  # Клиент, не успевающий читать столько данных, отключается
+
+
+def encode_maze(maze):
+    return zlib.compress(bytes(maze.cells), 6)
+
+
+# --- Сервер ---
+
+class Player:
+    def __init__(self, player_id, name, writer, room):
+        self.id = player_id
+        self.name = name
+        self.writer = writer
+        self.core = GameCore(room.maze, clock=room.clock, index=room.index)
+        self.core.reset()
+        self.pending = deque()
+        self.reported_finish = False
+
+
+class Room:
+    def __init__(self, name, maze, index, packed, tick_rate):
+        self.name = name
+        self.maze = maze
+        self.index = index
+        self.packed = packed  # Сжатые клетки для WELCOME
+        self.tick_dt = 1.0 / tick_rate
+        self.tick = 0
+        self.players = {}
+        self.entries = bytearray()  # Записи UPDATE, накопленные за текущий шаг
+        self.count = 0
+
+    def clock(self):
+        return self.tick * self.tick_dt
+
+    def add_entry(self, player_id, kind, data=b''):
+        self.entries += ENTRY.pack(player_id, kind)
+        self.entries += data
+        self.count += 1
+
+    def join_entry(self, player):
+        return POSITION.pack(*player.core.player_pos) + pack_text(player.name)
+
+    def step(self):
+        # Один шаг комнаты: применяет ходы из очередей и возвращает кадр UPDATE или None.
+        # Как и в игре, не больше одного хода игрока за шаг; остальные ждут в очереди.
+        self.tick += 1
+        for player in self.players.values():
+            if player.pending:
+                code = player.pending.popleft()
+                if player.core.move(code).moved:
+                    self.add_entry(player.id, code)
+            if player.core.finished and not player.reported_finish:
+                player.reported_finish = True
+                ticks = round(player.core.elapsed / self.tick_dt)
+                self.add_entry(player.id, FINISH, TICKS.pack(ticks))
+        if not self.count:
+            return None
+        update = frame(UPDATE, UPDATE_HEADER.pack(self.tick, self.count) + bytes(self.entries))
+        self.entries.clear()
+        self.count = 0
+        return update
+
+
+class RaceServer:
+    def __init__(self, maze_factory, tick_rate=TICK_RATE):
+        self.maze_factory = maze_factory  # имя комнаты -> Maze
+        self.tick_rate = tick_rate
+        self.rooms = {}
+        self.mazes = {}   # Общие для комнат с одинаковым лабиринтом: ключ -> (Maze, MazeIndex, сжатые клетки)
+        self.next_id = 1
+        self.connections = 0
+
+    def room(self, name):
+        room = self.rooms.get(name)
+        if room is None:
+            maze = self.maze_factory(name)
+            key = (maze.rows, maze.cols, maze.start, maze.exit, bytes(maze.cells))
+            if key not in self.mazes:
+                self.mazes[key] = (maze, MazeIndex(maze), encode_maze(maze))
+            room = Room(name, *self.mazes[key], self.tick_rate)
+            self.rooms[name] = room
+        return room
+
+    async def handle_client(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections += 1
+        player = room = None
+        try:
+            kind, body = await read_frame(reader)
+            if kind != HELLO:
+                return
+            room_name, offset = unpack_text(body, 0)
+            name, _ = unpack_text(body, offset)
+            room = self.room(room_name)
+            player = Player(self.next_id, name or f"Игрок {self.next_id}", writer, room)
+            self.next_id = self.next_id % 0xFFFF + 1
+            maze = room.maze
+            writer.write(frame(WELCOME, WELCOME_HEADER.pack(player.id, self.tick_rate, maze.rows, maze.cols,
+                                                            *maze.start, *maze.exit) + room.packed))
+            # Новичку - снимок комнаты, остальным - запись о нем в ближайшем UPDATE
+            snapshot = bytearray()
+            for other in room.players.values():
+                snapshot += ENTRY.pack(other.id, JOIN) + room.join_entry(other)
+                if other.core.finished:
+                    ticks = round(other.core.elapsed / room.tick_dt)
+                    snapshot += ENTRY.pack(other.id, FINISH) + TICKS.pack(ticks)
+            count = len(room.players) + sum(other.core.finished for other in room.players.values())
+            if count:
+                writer.write(frame(UPDATE, UPDATE_HEADER.pack(room.tick, count) + bytes(snapshot)))
+            room.players[player.id] = player
+            room.add_entry(player.id, JOIN, room.join_entry(player))
+            while True:
+                kind, body = await read_frame(reader)
+                if kind == MOVE and body and body[0] < len(DIRECTIONS):
+                    if len(player.pending) < MAX_PENDING_MOVES:
+                        player.pending.append(body[0])
+                elif kind == RESET:
+                    player.core.reset()
+                    player.pending.clear()
+                    player.reported_finish = False
+                    room.add_entry(player.id, RESET_ENTRY)
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError, struct.error):
+            pass  # Обрыв связи или неверный кадр: клиент отключается
+        finally:
+            self.connections -= 1
+            if player is not None and room.players.pop(player.id, None) is not None:
+                room.add_entry(player.id, LEAVE)
+                if not room.players:
+                    del self.rooms[room.name]
+            writer.close()
+
+    async def tick_loop(self):
+        # Фиксированный шаг: все комнаты продвигаются вместе, каждая рассылает одно сообщение
+        tick_dt = 1.0 / self.tick_rate
+        next_tick = time.perf_counter()
+        while True:
+            next_tick += tick_dt
+            for room in list(self.rooms.values()):
+                update = room.step()
+                if update is None:
+                    continue
+                for player in list(room.players.values()):
+                    transport = player.writer.transport
+                    if transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                        transport.abort()  # Клиент не читает: отключаем, а не копим данные
+                        continue
+                    player.writer.write(update)
+            delay = next_tick - time.perf_counter()
+            if delay < -tick_dt:
+                next_tick = time.perf_counter()  # Сервер не успевает: отставание не накапливается
+            await asyncio.sleep(max(0.0, delay))
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print("Сервер гонок слушает", ", ".join(str(s.getsockname()) for s in server.sockets))
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.tick_loop())
+
+
+async def read_frame(reader):
+    size, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if size > MAX_FRAME:
+        raise ConnectionError(f"Слишком длинный кадр: {size} байт")
+    body = await reader.readexactly(size) if size else b''
+    return kind, body
+
+
+# --- Запуск сервера ---
+
+def maze_factory_from_args(args):
+    if not args.size:
+        return lambda room: Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS)
+    rows, cols = args.size
+    # Без --seed у каждой комнаты свой лабиринт, определяемый ее именем
+    return lambda room: generate(rows, cols, args.algorithm,
+                                 args.seed if args.seed is not None else zlib.crc32(room.encode('utf-8')))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер гонок по лабиринту")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE, help="шагов сервера в секунду")
+    parser.add_argument("--size", type=parse_size, metavar="ROWSxCOLS", help="генерировать лабиринты заданного размера")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default='backtracker')
+    parser.add_argument("--seed", type=int, help="зерно генератора (по умолчанию - из имени комнаты)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = RaceServer(maze_factory_from_args(args), args.tick_rate)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
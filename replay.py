@@ -0,0 +1,178 @@
+# Запись и воспроизведение забегов. Забег хранится как поток пар (шаг логики, ход) в
+# компактном двоичном формате:
+#
+#   заголовок: сигнатура b'MZRP', версия (u16), частота шагов (u16),
+#              хэш лабиринта (16 байт blake2b), зерно ГСЧ частиц (u64)
+#   тело:      по одному varint (LEB128) на ход: (приращение шага << 2) | код хода
+#
+# Игра делает не больше одного хода за шаг логики, поэтому приращение шага у всех ходов,
+# кроме первого, не меньше единицы; запись с несколькими ходами в одном шаге недействительна.
+# Типичный ход занимает один-два байта. Модуль не зависит от pygame: проверка записей
+# идет через GameCore без окна и без реального времени, быстрее любой скорости игры.
+#
+#   python replay.py run.mzr                      # проверить запись на встроенном лабиринте
+#   python replay.py --size 101x101 --seed 3 replays/*.mzr
+import argparse
+import hashlib
+import json
+import struct
+import sys
+from collections import namedtuple
+
+from maze_core import MAZE_LAYOUT, START_POS, EXIT_POS, Maze, GameCore, ManualClock
+from maze_gen import ALGORITHMS, generate, parse_size
+from maze_index import MazeIndex
+
+MAGIC = b'MZRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHH16sQ')  # сигнатура, версия, частота шагов, хэш лабиринта, зерно
+
+# Итог проверки записи: time - время забега в секундах (None, если выход не достигнут),
+# reason - причина отказа для недействительной записи
+Verdict = namedtuple('Verdict', 'valid finished moves dead_ends time reason')
+
+
+def maze_hash(maze):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(struct.pack('<6I', maze.rows, maze.cols, *maze.start, *maze.exit))
+    h.update(maze.cells)
+    return h.digest()
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class Replay:
+    def __init__(self, maze_hash, seed, tick_rate, body=b''):
+        self.maze_hash = maze_hash
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.body = bytearray()
+        self.last_tick = 0
+        self.count = 0
+        if body:
+            self.body[:] = body
+            for tick, _ in self.events():
+                self.last_tick = tick
+                self.count += 1
+
+    def append(self, tick, move):
+        # tick - номер шага логики от начала забега; шаги строго возрастают
+        if tick < self.last_tick or (self.count and tick == self.last_tick):
+            raise ValueError("Шаги записи должны идти по возрастанию")
+        write_varint(self.body, (tick - self.last_tick) << 2 | move)
+        self.last_tick = tick
+        self.count += 1
+
+    def events(self):
+        tick = 0
+        value = 0
+        shift = 0
+        first = True
+        for byte in self.body:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                if shift > 63:  # Больше 10 байт: в u64 не помещается, запись испорчена
+                    raise ValueError("Слишком длинное число в записи")
+                continue
+            if value >> 2 == 0 and not first:
+                raise ValueError(f"несколько ходов за один шаг {tick}")
+            first = False
+            tick += value >> 2
+            yield tick, value & 3
+            value = 0
+            shift = 0
+        if shift:
+            raise ValueError("Запись обрывается посреди хода")
+
+    def moves(self):
+        return [move for _, move in self.events()]
+
+    @property
+    def duration(self):
+        return self.last_tick / self.tick_rate
+
+    # --- Сериализация ---
+
+    def encode(self):
+        return HEADER.pack(MAGIC, VERSION, self.tick_rate, self.maze_hash, self.seed) + bytes(self.body)
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Запись короче заголовка")
+        magic, version, tick_rate, digest, seed = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Это не запись забега")
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия записи: {version}")
+        if tick_rate == 0:
+            raise ValueError("В записи нулевая частота шагов")
+        return cls(digest, seed, tick_rate, data[HEADER.size:])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.decode(f.read())
+
+
+def verify(replay, maze, index=None):
+    # Проигрывает запись через GameCore на ручных часах. Каждый записанный ход обязан
+    # сдвигать игрока: в игре записываются только состоявшиеся ходы.
+    if replay.maze_hash != maze_hash(maze):
+        return Verdict(False, False, 0, 0, None, "запись сделана на другом лабиринте")
+    clock = ManualClock()
+    core = GameCore(maze, clock=clock, index=index)
+    core.reset()
+    tick_dt = 1.0 / replay.tick_rate
+    try:
+        for tick, move in replay.events():
+            if core.finished:
+                return Verdict(False, True, core.moves, core.dead_ends, None, "ходы после выхода из лабиринта")
+            clock.now = tick * tick_dt
+            if not core.move(move).moved:
+                return Verdict(False, False, core.moves, core.dead_ends, None, f"ход в стену на шаге {tick}")
+    except ValueError as e:
+        return Verdict(False, core.finished, core.moves, core.dead_ends, None, str(e))
+    return Verdict(True, core.finished, core.moves, core.dead_ends,
+                   core.elapsed if core.finished else None, None)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка записей забегов")
+    parser.add_argument("files", nargs='+', help="файлы записей (.mzr)")
+    parser.add_argument("--size", type=parse_size, metavar="ROWSxCOLS", help="размер сгенерированного лабиринта вместо встроенного")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default='backtracker')
+    parser.add_argument("--seed", type=int, help="зерно генератора лабиринта")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.size:
+        maze = generate(*args.size, args.algorithm, args.seed)
+    else:
+        maze = Maze.from_layout(MAZE_LAYOUT, START_POS, EXIT_POS)
+    index = MazeIndex(maze)
+    valid = 0
+    for path in args.files:
+        try:
+            verdict = verify(Replay.load(path), maze, index)
+        except (OSError, ValueError) as e:
+            verdict = Verdict(False, False, 0, 0, None, str(e))
+        valid += verdict.valid
+        print(json.dumps({'file': path, **verdict._asdict()}, ensure_ascii=False))
+    print(f"Действительных записей: {valid} из {len(args.files)}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
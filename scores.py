@@ -0,0 +1,165 @@
+# Хранилище результатов: все законченные забеги по каждому лабиринту и игроку в SQLite
+# (режим WAL). С базой работает один фоновый поток: записи копятся в очереди и пишутся
+# пачками, каждая пачка - одна транзакция, так что кадр игры не ждет диска. Запросы
+# таблиц рекордов тоже выполняются в этом потоке и возвращают Future. Индекс
+# (maze_hash, time, moves, id) отдает первые N результатов лабиринта без сортировки
+# всей таблицы, а число результатов для постраничного вывода хранится в maze_totals
+# и обновляется в той же транзакции, без COUNT(*) по миллионам строк. База лежит в
+# каталоге данных пользователя, а не в текущем каталоге. Модуль не зависит от pygame.
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+DATA_DIR = os.path.join(os.path.expanduser('~'), '.local', 'share', 'maze_game')
+DEFAULT_DB = os.path.join(DATA_DIR, 'scores.db')
+MAX_BATCH = 1000  # Максимум записей в одной транзакции
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    maze_hash TEXT NOT NULL,
+    player TEXT NOT NULL,
+    time REAL NOT NULL,
+    moves INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_leaderboard ON runs (maze_hash, time, moves, id);
+CREATE TABLE IF NOT EXISTS maze_totals (
+    maze_hash TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL
+);
+"""
+
+INSERT_RUN = "INSERT INTO runs (maze_hash, player, time, moves, created_at) VALUES (?, ?, ?, ?, ?)"
+COUNT_RUN = ("INSERT INTO maze_totals (maze_hash, runs) VALUES (?, 1) "
+             "ON CONFLICT (maze_hash) DO UPDATE SET runs = runs + 1")
+
+Score = namedtuple('Score', 'player time moves created_at')
+
+
+class ScoreStore:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.tasks = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self.worker, name='scores', daemon=True)
+        self.thread.start()
+
+    # --- Интерфейс для игры (вызывается из главного потока, не блокирует) ---
+
+    def add_run(self, maze_hash, player, time_taken, moves, created_at=None):
+        created_at = created_at if created_at is not None else time.time()
+        self.tasks.put(('add', (maze_hash, player, time_taken, moves, created_at)))
+
+    def page(self, maze_hash, page, page_size):
+        # Future со списком Score на странице и общим числом результатов лабиринта
+        return self.submit(self.query_page, maze_hash, page, page_size)
+
+    def best_time(self, maze_hash):
+        return self.submit(self.query_best_time, maze_hash)
+
+    def import_record(self, path, maze_hash, player):
+        # Рекорд из файла прежних версий игры (одно число - время) переносится в базу
+        # один раз: после записи файл переименовывается в *.imported
+        return self.submit(self.import_record_file, path, maze_hash, player)
+
+    def flush(self):
+        # Future, который завершится, когда все поставленные ранее записи будут в базе
+        return self.submit(lambda conn: None)
+
+    def submit(self, func, *args):
+        future = Future()
+        self.tasks.put(('query', (future, func, args)))
+        return future
+
+    def close(self):
+        if self.thread.is_alive():
+            self.tasks.put(('stop', None))
+            self.thread.join()
+
+    # --- Фоновый поток ---
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # В WAL-режиме транзакции остаются атомарными
+        conn.executescript(SCHEMA)
+        return conn
+
+    def worker(self):
+        try:
+            conn = self.connect()
+        except sqlite3.Error as e:
+            print("Ошибка открытия базы рекордов:", e)
+            self.error = e
+            conn = None
+        running = True
+        while running:
+            batch = [self.tasks.get()]
+            # Все, что накопилось в очереди к этому моменту, обрабатывается одной пачкой
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.tasks.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [payload for kind, payload in batch if kind == 'add']
+            if rows and conn is not None:
+                try:
+                    with conn:
+                        conn.executemany(INSERT_RUN, rows)
+                        conn.executemany(COUNT_RUN, [(row[0],) for row in rows])
+                except sqlite3.Error as e:
+                    print("Ошибка сохранения результатов:", e)
+            for kind, payload in batch:
+                if kind == 'query':
+                    future, func, args = payload
+                    if conn is None:
+                        future.set_exception(self.error)
+                        continue
+                    try:
+                        future.set_result(func(conn, *args))
+                    except sqlite3.Error as e:
+                        future.set_exception(e)
+                elif kind == 'stop':
+                    running = False
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def query_page(conn, maze_hash, page, page_size):
+        rows = conn.execute(
+            "SELECT player, time, moves, created_at FROM runs WHERE maze_hash = ? "
+            "ORDER BY time, moves, id LIMIT ? OFFSET ?",
+            (maze_hash, page_size, page * page_size)).fetchall()
+        total = conn.execute("SELECT runs FROM maze_totals WHERE maze_hash = ?", (maze_hash,)).fetchone()
+        return [Score(*row) for row in rows], total[0] if total is not None else 0
+
+    @staticmethod
+    def import_record_file(conn, path, maze_hash, player):
+        try:
+            with open(path, 'r') as f:
+                best = float(f.read().strip())
+            created_at = os.path.getmtime(path)
+        except (OSError, ValueError) as e:
+            print("Ошибка чтения рекорда:", e)
+            return None
+        # Число ходов прежние версии не сохраняли
+        with conn:
+            conn.execute(INSERT_RUN, (maze_hash, player, best, 0, created_at))
+            conn.execute(COUNT_RUN, (maze_hash,))
+        try:
+            os.replace(path, path + '.imported')
+        except OSError as e:
+            print("Не удалось переименовать файл рекорда:", e)
+        return best
+
+    @staticmethod
+    def query_best_time(conn, maze_hash):
+        return conn.execute("SELECT MIN(time) FROM runs WHERE maze_hash = ?", (maze_hash,)).fetchone()[0]